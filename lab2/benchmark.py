@@ -0,0 +1,272 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from PIL import Image
+
+from metadata_cache import MetadataCache
+from record_store import RecordStore
+from scanner import ImageScanner, read_header, walk_images
+from ui_channel import UIChannel
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+FORMATS = {
+    'jpg': ("JPEG", {'quality': 85}),
+    'png': ("PNG", {}),
+    'gif': ("GIF", {}),
+    'tif': ("TIFF", {}),
+    'bmp': ("BMP", {}),
+    'pcx': ("PCX", {}),
+}
+TIFF_COMPRESSIONS = ("raw", "tiff_lzw", "tiff_deflate", "packbits")
+CORPUS_VERSION = 1
+
+
+def corpus_params(files, depth, fanout, min_size, max_size, seed):
+    return {
+        'version': CORPUS_VERSION,
+        'files': files,
+        'depth': depth,
+        'fanout': fanout,
+        'min_size': min_size,
+        'max_size': max_size,
+        'seed': seed,
+    }
+
+
+def corpus_name(params):
+    digest = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+    return f"image_scan_corpus_{digest}"
+
+
+def generate_corpus(root, params):
+    manifest = os.path.join(root, "corpus.json")
+    if os.path.exists(manifest):
+        with open(manifest) as f:
+            if json.load(f) == params:
+                return False
+        # a corpus made with other parameters: start from an empty folder, so that no
+        # stale files are scanned with the new ones
+        shutil.rmtree(root)
+    elif os.path.isdir(root) and os.listdir(root):
+        raise ValueError(f"{root} is not empty and holds no corpus; refusing to write into it")
+    rng = random.Random(params['seed'])
+    exts = sorted(FORMATS)
+    for i in range(params['files']):
+        parts = []
+        n = i
+        for _ in range(rng.randint(0, params['depth'])):
+            parts.append(f"d{n % params['fanout']}")
+            n //= params['fanout']
+        folder = os.path.join(root, *parts)
+        os.makedirs(folder, exist_ok=True)
+
+        ext = exts[i % len(exts)]
+        fmt, options = FORMATS[ext]
+        size = (rng.randint(params['min_size'], params['max_size']), rng.randint(params['min_size'], params['max_size']))
+        img = Image.merge("RGB", [Image.effect_noise(size, rng.randint(8, 64)),
+                                  Image.linear_gradient("L").resize(size),
+                                  Image.radial_gradient("L").resize(size)])
+        if fmt == "GIF":
+            img = img.convert("P")
+        elif fmt == "TIFF":
+            options = {'compression': rng.choice(TIFF_COMPRESSIONS)}
+        if fmt in ("JPEG", "PNG", "TIFF"):
+            options = dict(options, dpi=(rng.choice((72, 96, 300)),) * 2)
+        img.save(os.path.join(folder, f"img{i:06d}.{ext}"), fmt, **options)
+    with open(manifest, "w") as f:
+        json.dump(params, f)
+    return True
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))]
+
+
+def rate(count, elapsed):
+    return round(count / elapsed, 1) if elapsed > 0 else None
+
+
+def bench_walk(root):
+    start = time.perf_counter()
+    entries = list(walk_images(root))
+    elapsed = time.perf_counter() - start
+    return entries, {'files': len(entries), 'seconds': round(elapsed, 4), 'files_per_sec': rate(len(entries), elapsed),
+                     'peak_rss_mb': peak_rss_mb()}
+
+
+def bench_latency(entries):
+    latencies = []
+    for file_path, file_size, mtime_ns in entries:
+        start = time.perf_counter()
+        read_header(file_path, file_size, mtime_ns)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return {
+        'files': len(latencies),
+        'p50_ms': round(percentile(latencies, 50), 4),
+        'p99_ms': round(percentile(latencies, 99), 4),
+        'max_ms': round(max(latencies, default=0.0), 4),
+    }
+
+
+def bench_scan(entries, workers, use_processes, cache=None):
+    scanner = ImageScanner(workers=workers, use_processes=use_processes, cache=cache)
+    start = time.perf_counter()
+    count = sum(1 for _ in scanner.scan(entries))
+    elapsed = time.perf_counter() - start
+    return {'files': count, 'seconds': round(elapsed, 4), 'files_per_sec': rate(count, elapsed),
+            'peak_rss_mb': peak_rss_mb()}
+
+
+class ManualRoot:
+    # stands in for Tk so the channel can be driven without a display
+    def after(self, ms, func=None, *args):
+        return None
+
+    def after_cancel(self, job):
+        pass
+
+
+def bench_ui_feed(entries, visible_rows=40):
+    headers = [read_header(*entry) for entry in entries]
+    store = RecordStore()
+
+    def consume(batch):
+        for header in batch:
+            store.append(header)
+        # a refresh renders one screenful of rows
+        for index in range(max(0, len(store) - visible_rows), len(store)):
+            store.row(index)
+
+    channel = UIChannel(ManualRoot(), consume, on_progress=lambda progress: None)
+
+    def produce():
+        for i, header in enumerate(headers):
+            channel.put(header)
+            channel.set_progress(i + 1)
+
+    start = time.perf_counter()
+    producer = threading.Thread(target=produce)
+    producer.start()
+    while producer.is_alive() or len(store) < len(headers):
+        channel.tick()
+    elapsed = time.perf_counter() - start
+    metrics = channel.metrics()
+    return {
+        'files': len(store),
+        'seconds': round(elapsed, 4),
+        'files_per_sec': rate(len(store), elapsed),
+        'ticks': metrics['ticks'],
+        'mean_latency_ms': round(metrics['mean_latency_ms'], 4),
+        'max_latency_ms': round(metrics['max_latency_ms'], 4),
+        'progress_coalesced': metrics['progress_coalesced'],
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    params = corpus_params(args.files, args.depth, args.fanout, args.min_size, args.max_size, args.seed)
+    corpus = args.corpus or os.path.join(tempfile.gettempdir(), corpus_name(params))
+    start = time.perf_counter()
+    generated = generate_corpus(corpus, params)
+    print(f"Corpus: {corpus} ({'generated in %.1f s' % (time.perf_counter() - start) if generated else 'reused'})")
+
+    results = {}
+    entries, results['walk'] = bench_walk(corpus)
+    print(f"walk: {results['walk']['files_per_sec']} files/s")
+
+    results['header_latency'] = bench_latency(entries)
+    print(f"header latency: p50 {results['header_latency']['p50_ms']} ms, p99 {results['header_latency']['p99_ms']} ms")
+
+    for workers in args.workers:
+        for use_processes in ((False, True) if args.processes else (False,)):
+            name = f"scan_{'processes' if use_processes else 'threads'}_{workers}"
+            results[name] = bench_scan(entries, workers, use_processes)
+            print(f"{name}: {results[name]['files_per_sec']} files/s")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = MetadataCache(os.path.join(tmp, "bench.sqlite3"))
+        results['cache_cold'] = bench_scan(entries, args.workers[-1], False, cache)
+        cache.close()
+        cache = MetadataCache(os.path.join(tmp, "bench.sqlite3"))
+        results['cache_warm'] = bench_scan(entries, args.workers[-1], False, cache)
+        results['cache_warm']['hit_rate'] = round(cache.stats()['hit_rate'], 4)
+        cache.close()
+    print(f"cache: cold {results['cache_cold']['files_per_sec']} files/s, "
+          f"warm {results['cache_warm']['files_per_sec']} files/s")
+
+    results['ui_feed'] = bench_ui_feed(entries)
+    print(f"ui feed: {results['ui_feed']['files_per_sec']} files/s, "
+          f"mean latency {results['ui_feed']['mean_latency_ms']} ms")
+
+    report = {
+        'benchmark': "lab2-scan",
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'corpus': params,
+        'results': results,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+    return report
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the lab2 image scanner on a synthetic corpus.")
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--depth", type=int, default=3, help="maximum directory depth")
+    parser.add_argument("--fanout", type=int, default=8, help="subdirectories per level")
+    parser.add_argument("--min-size", type=int, default=32)
+    parser.add_argument("--max-size", type=int, default=512)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--corpus", help="corpus directory (default: a folder in the temp dir)")
+    parser.add_argument("--workers", default=f"1,{os.cpu_count() or 1}",
+                        type=lambda s: sorted({int(v) for v in s.split(",")}), help="comma-separated worker counts")
+    parser.add_argument("--processes", action="store_true", help="also benchmark the process pool")
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    try:
+        run(parse_args())
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
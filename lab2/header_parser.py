@@ -0,0 +1,237 @@
+import mmap
+import struct
+
+TIFF_COMPRESSION = {
+    1: "None",
+    2: "CCITT RLE",
+    3: "CCITT Group 3",
+    4: "CCITT Group 4",
+    5: "LZW",
+    6: "Old-style JPEG",
+    7: "JPEG",
+    8: "Deflate",
+    32773: "PackBits",
+    32946: "Deflate",
+    34712: "JPEG 2000",
+    34887: "LERC",
+    34925: "LZMA",
+    50000: "Zstandard",
+    50001: "WebP",
+}
+
+BMP_COMPRESSION = {
+    0: "None",
+    1: "RLE8",
+    2: "RLE4",
+    3: "Bitfields",
+    4: "JPEG",
+    5: "PNG",
+    6: "Alpha bitfields",
+}
+
+JPEG_PROCESS = {
+    0xC0: "baseline",
+    0xC1: "extended sequential",
+    0xC2: "progressive",
+    0xC3: "lossless",
+    0xC5: "differential sequential",
+    0xC6: "differential progressive",
+    0xC7: "differential lossless",
+    0xC9: "arithmetic sequential",
+    0xCA: "arithmetic progressive",
+    0xCB: "arithmetic lossless",
+    0xCD: "arithmetic differential sequential",
+    0xCE: "arithmetic differential progressive",
+    0xCF: "arithmetic differential lossless",
+}
+
+PNG_CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+MAX_TIFF_PAGES = 100000
+
+
+def _tiff(data):
+    order = "<" if data[:2] == b"II" else ">"
+    magic = struct.unpack_from(order + "H", data, 2)[0]
+    if magic == 42:
+        offset = struct.unpack_from(order + "I", data, 4)[0]
+        count_fmt, entry_size, value_fmt, next_fmt, inline = "H", 12, "I", "I", 4
+    elif magic == 43:
+        offset = struct.unpack_from(order + "Q", data, 8)[0]
+        count_fmt, entry_size, value_fmt, next_fmt, inline = "Q", 20, "Q", "Q", 8
+    else:
+        return None
+    count_size = struct.calcsize(count_fmt)
+    type_sizes = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 16: 8, 17: 8, 18: 8}
+    short_fmt = {1: "B", 3: "H", 4: "I", 16: "Q"}
+
+    def values(tag_type, count, field):
+        fmt = short_fmt.get(tag_type)
+        if fmt is None:
+            return []
+        if type_sizes[tag_type] * count <= inline:
+            start = field
+        else:
+            start = struct.unpack_from(order + value_fmt, data, field)[0]
+        return list(struct.unpack_from(order + fmt * min(count, 16), data, start))
+
+    tags = {}
+    pages = 0
+    seen = set()
+    while offset and offset not in seen and pages < MAX_TIFF_PAGES:
+        seen.add(offset)
+        entries = struct.unpack_from(order + count_fmt, data, offset)[0]
+        if pages == 0:
+            for i in range(entries):
+                field = offset + count_size + i * entry_size
+                tag, tag_type = struct.unpack_from(order + "HH", data, field)
+                count = struct.unpack_from(order + value_fmt, data, field + 4)[0]
+                if tag in (258, 259, 277):
+                    tags[tag] = values(tag_type, count, field + 4 + struct.calcsize(value_fmt))
+        pages += 1
+        offset = struct.unpack_from(order + next_fmt, data, offset + count_size + entries * entry_size)[0]
+
+    compression = (tags.get(259) or [1])[0]
+    samples = (tags.get(277) or [1])[0]
+    bits = tags.get(258) or [1]
+    if len(bits) < samples:
+        bits = bits * samples
+    return {
+        'codec': f"{TIFF_COMPRESSION.get(compression, f'code {compression}')} (TIFF)",
+        'frames': pages,
+        'bit_depth': sum(bits[:samples]),
+    }
+
+
+def _bmp(data):
+    header_size = struct.unpack_from("<I", data, 14)[0]
+    if header_size == 12:
+        return {'codec': "None (BMP)", 'frames': 1, 'bit_depth': struct.unpack_from("<H", data, 24)[0]}
+    bit_count, compression = struct.unpack_from("<HI", data, 28)
+    return {
+        'codec': f"{BMP_COMPRESSION.get(compression, f'code {compression}')} (BMP)",
+        'frames': 1,
+        'bit_depth': bit_count,
+    }
+
+
+def _png(data):
+    bit_depth, color_type, _, _, interlace = struct.unpack_from(">BBBBB", data, 24)
+    frames = 1
+    pos = 8
+    # an APNG announces its frame count in acTL, which must come before the first IDAT
+    while pos + 8 <= len(data):
+        length, chunk = struct.unpack_from(">I4s", data, pos)
+        if chunk == b"acTL":
+            frames = struct.unpack_from(">I", data, pos + 8)[0]
+            break
+        if chunk in (b"IDAT", b"IEND"):
+            break
+        pos += 12 + length
+    codec = "Deflate (PNG, Adam7 interlaced)" if interlace else "Deflate (PNG)"
+    return {'codec': codec, 'frames': frames, 'bit_depth': bit_depth * PNG_CHANNELS.get(color_type, 1)}
+
+
+def _skip_sub_blocks(data, pos, end):
+    while pos < end:
+        size = data[pos]
+        pos += 1
+        if size == 0:
+            return pos
+        pos += size
+    return pos
+
+
+def _gif(data):
+    packed = data[10]
+    bit_depth = (packed & 0x07) + 1
+    pos = 13
+    if packed & 0x80:
+        pos += 3 << ((packed & 0x07) + 1)
+    # the frames are counted exactly by hopping over the sub-blocks by their lengths,
+    # which reads one byte in every 256 of the image data
+    frames = 0
+    end = len(data)
+    while pos < end:
+        block = data[pos]
+        if block == 0x2C:
+            frames += 1
+            local = data[pos + 9]
+            pos += 10
+            if local & 0x80:
+                pos += 3 << ((local & 0x07) + 1)
+            pos = _skip_sub_blocks(data, pos + 1, end)
+        elif block == 0x21:
+            pos = _skip_sub_blocks(data, pos + 2, end)
+        else:
+            break
+    return {'codec': "LZW (GIF)", 'frames': max(frames, 1), 'bit_depth': bit_depth}
+
+
+def _jpeg(data):
+    pos = 2
+    size = len(data)
+    while pos + 4 <= size:
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            pos += 1
+            continue
+        if marker in JPEG_PROCESS:
+            precision = data[pos + 4]
+            components = data[pos + 9]
+            return {
+                'codec': f"JPEG ({JPEG_PROCESS[marker]})",
+                'frames': 1,
+                'bit_depth': precision * components,
+            }
+        if marker in (0xD9, 0xDA):
+            return None
+        if marker == 0x01 or 0xD0 <= marker <= 0xD7:
+            pos += 2
+            continue
+        pos += 2 + struct.unpack_from(">H", data, pos + 2)[0]
+    return None
+
+
+def _pcx(data):
+    encoding, bits = data[2], data[3]
+    planes = data[65]
+    return {
+        'codec': "RLE (PCX)" if encoding == 1 else "None (PCX)",
+        'frames': 1,
+        'bit_depth': bits * planes,
+    }
+
+
+def parse_buffer(data):
+    # `data` only needs slicing and indexing, so an mmap works and the OS pages in just
+    # the parts the parser touches instead of the whole file
+    head = data[:8]
+    if head[:2] in (b"II", b"MM"):
+        return _tiff(data)
+    if head[:2] == b"BM":
+        return _bmp(data)
+    if head == b"\x89PNG\r\n\x1a\n":
+        return _png(data)
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return _gif(data)
+    if head[:2] == b"\xff\xd8":
+        return _jpeg(data)
+    if head[:1] == b"\x0a" and len(data) >= 128:
+        return _pcx(data)
+    return None
+
+
+def parse_file(f):
+    try:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return parse_buffer(data)
+    except (ValueError, OSError, struct.error, IndexError, KeyError):
+        return None
+
+
+def parse_header(file_path):
+    with open(file_path, "rb") as f:
+        return parse_file(f)
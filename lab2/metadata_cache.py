@@ -0,0 +1,96 @@
+import json
+import os
+import sqlite3
+import threading
+
+# bump whenever the stored header fields change so stale entries are dropped
+CACHE_VERSION = 2
+
+
+def default_cache_path():
+    return os.path.join(os.path.expanduser("~"), ".image_info_cache.sqlite3")
+
+
+class MetadataCache:
+    def __init__(self, db_path=None, flush_every=500):
+        self.db_path = db_path or default_cache_path()
+        self.flush_every = flush_every
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != CACHE_VERSION:
+            self.conn.execute("DROP TABLE IF EXISTS headers")
+            self.conn.execute(f"PRAGMA user_version = {CACHE_VERSION}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS headers ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, header TEXT NOT NULL)"
+        )
+        self.conn.commit()
+        self.lock = threading.Lock()
+        self.pending = []
+        self.seen = set()
+        self.hits = 0
+        self.misses = 0
+        self.pruned = 0
+
+    def get(self, file_path, file_size, mtime_ns):
+        self.seen.add(file_path)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT header FROM headers WHERE path = ? AND size = ? AND mtime_ns = ?",
+                (file_path, file_size, mtime_ns)
+            ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        header = json.loads(row[0])
+        header['full_path'] = file_path
+        header['file_size'] = file_size
+        header['mtime_ns'] = mtime_ns
+        header['dpi'] = tuple(header['dpi'])
+        return header
+
+    def put(self, header):
+        file_path = header['full_path']
+        self.seen.add(file_path)
+        stored = {k: v for k, v in header.items() if k not in ('full_path', 'file_size', 'mtime_ns')}
+        self.pending.append((file_path, header['file_size'], header['mtime_ns'], json.dumps(stored)))
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO headers VALUES (?, ?, ?, ?)", self.pending)
+            self.conn.commit()
+        self.pending = []
+
+    def prune(self, folder):
+        # drop entries under the scanned folder that were not seen during this scan
+        prefix = os.path.join(folder, "")
+        self.flush()
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path FROM headers WHERE path >= ? AND path < ?", (prefix, prefix + "\uffff")
+            ).fetchall()
+            stale = [(path,) for (path,) in rows if path not in self.seen]
+            self.conn.executemany("DELETE FROM headers WHERE path = ?", stale)
+            self.conn.commit()
+        self.pruned += len(stale)
+        return len(stale)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'pruned': self.pruned,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            self.conn.close()
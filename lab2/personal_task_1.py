@@ -1,12 +1,20 @@
 import tkinter as tk
 from tkinter import ttk
 from tkinter import filedialog, messagebox
-from PIL import Image, ImageTk
+from PIL import ImageTk
 import os
 import sys
 import subprocess
 import threading
-from collections import deque
+
+from scanner import ImageScanner, default_workers, walk_images
+from metadata_cache import MetadataCache
+from record_store import COLUMNS, RecordStore, format_file_size
+from ui_channel import UIChannel
+from thumbnails import ThumbnailCache, default_thumbnail_dir
+from virtual_table import VirtualTable
+
+PREFETCH_OFFSETS = (1, -1, 2, 3, -2)
 
 class ImageInfoApp:
     def __init__(self, root):
@@ -14,13 +22,19 @@ class ImageInfoApp:
         self.root.title("Image Information Reader")
         self.root.geometry("1100x700")
 
-        self.item_to_path = {}
-        self.files_queue = deque()
         self.processing = False
-        self.all_files_data = {}
+        self.store = RecordStore()
+        self.filter_job = None
+        self.scanner = None
+        # channel items carry the id of the scan that produced them
+        self.scan_id = 0
+        self.thumbnails = ThumbnailCache(max_size=400)
 
         self.create_widgets()
 
+        self.channel = UIChannel(self.root, self.add_records, on_progress=self.show_progress)
+        self.channel.start()
+
     def create_widgets(self):
         main_frame = tk.Frame(self.root)
         main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
@@ -36,6 +50,23 @@ class ImageInfoApp:
         browse_button = tk.Button(top_frame, text="Browse", command=self.browse_folder)
         browse_button.pack(side=tk.LEFT, padx=5)
 
+        self.workers = tk.IntVar(value=default_workers())
+        tk.Label(top_frame, text="Workers:").pack(side=tk.LEFT, padx=(15, 5))
+        tk.Spinbox(top_frame, from_=1, to=128, width=4, textvariable=self.workers).pack(side=tk.LEFT)
+
+        self.pool_type = tk.StringVar(value="threads")
+        tk.Label(top_frame, text="Pool:").pack(side=tk.LEFT, padx=(15, 5))
+        ttk.Combobox(top_frame, textvariable=self.pool_type, values=("threads", "processes"),
+                     state="readonly", width=10).pack(side=tk.LEFT)
+
+        self.ordered = tk.BooleanVar(value=False)
+        tk.Checkbutton(top_frame, text="Ordered", variable=self.ordered).pack(side=tk.LEFT, padx=10)
+
+        self.use_cache = tk.BooleanVar(value=True)
+        tk.Checkbutton(top_frame, text="Use cache", variable=self.use_cache).pack(side=tk.LEFT)
+
+        tk.Button(top_frame, text="Statistics", command=self.show_statistics).pack(side=tk.LEFT, padx=10)
+
         self.progress = ttk.Progressbar(main_frame, mode='determinate')
         self.progress.pack(fill=tk.X, pady=5)
 
@@ -50,36 +81,30 @@ class ImageInfoApp:
 
         tk.Label(left_frame, text="Image Files:", font=('Arial', 10, 'bold')).pack(anchor=tk.W)
 
-        table_frame = tk.Frame(left_frame)
-        table_frame.pack(fill=tk.BOTH, expand=True, pady=5)
-
-        table_scroll_y = ttk.Scrollbar(table_frame)
-        table_scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
+        filter_frame = tk.Frame(left_frame)
+        filter_frame.pack(fill=tk.X, pady=(5, 0))
 
-        columns = ("Filename", "Size (px)", "Resolution (dpi)", "Color Depth", "Compression", "Compression Ratio", "full_path")
-        self.tree = ttk.Treeview(table_frame, columns=columns, show="headings", 
-                                yscrollcommand=table_scroll_y.set,
-                                height=15)
+        tk.Label(filter_frame, text="Filter:").pack(side=tk.LEFT)
+        self.filter_text = tk.StringVar()
+        filter_entry = tk.Entry(filter_frame, textvariable=self.filter_text)
+        filter_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
+        filter_entry.bind('<KeyRelease>', self.schedule_filter)
 
-        self.tree.heading("Filename", text="Filename")
-        self.tree.heading("Size (px)", text="Size (px)")
-        self.tree.heading("Resolution (dpi)", text="Resolution (dpi)")
-        self.tree.heading("Color Depth", text="Color Depth")
-        self.tree.heading("Compression", text="Compression")
-        self.tree.heading("Compression Ratio", text="Compression Ratio")
-        self.tree.heading("full_path", text="Full Path")
+        self.filter_column = tk.StringVar(value="All columns")
+        filter_columns = ttk.Combobox(filter_frame, textvariable=self.filter_column, state="readonly", width=18,
+                                      values=["All columns"] + [name for name, _ in COLUMNS])
+        filter_columns.pack(side=tk.LEFT)
+        filter_columns.bind('<<ComboboxSelected>>', self.schedule_filter)
 
-        self.tree.column("Filename", width=180, minwidth=150)
-        self.tree.column("Size (px)", width=100, minwidth=80)
-        self.tree.column("Resolution (dpi)", width=120, minwidth=100)
-        self.tree.column("Color Depth", width=100, minwidth=80)
-        self.tree.column("Compression", width=100, minwidth=80)
-        self.tree.column("Compression Ratio", width=120, minwidth=100)
-        self.tree.column("full_path", width=0, stretch=False)
-
-        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        table_frame = tk.Frame(left_frame)
+        table_frame.pack(fill=tk.BOTH, expand=True, pady=5)
 
-        table_scroll_y.config(command=self.tree.yview)
+        self.table = VirtualTable(table_frame, COLUMNS, self.store,
+                                  on_select=self.on_select, on_open=self.on_double_click)
+        for name, width, minwidth in (("Filename", 180, 150), ("Size (px)", 100, 80),
+                                      ("Resolution (dpi)", 120, 100), ("Color Depth", 100, 80),
+                                      ("Compression", 100, 80), ("Compression Ratio", 120, 100)):
+            self.table.tree.column(name, width=width, minwidth=minwidth)
 
         right_frame = tk.Frame(content_frame, width=300)
         right_frame.pack(side=tk.RIGHT, fill=tk.BOTH, padx=(10, 0))
@@ -108,9 +133,6 @@ class ImageInfoApp:
         self.preview_frame.bind("<Configure>", self.on_frame_configure)
         self.preview_canvas.bind("<Configure>", self.on_canvas_configure)
 
-        self.tree.bind('<<TreeviewSelect>>', self.on_select)
-        self.tree.bind('<Double-1>', self.on_double_click)
-
     def on_frame_configure(self, event):
         self.preview_canvas.configure(scrollregion=self.preview_canvas.bbox("all"))
 
@@ -128,172 +150,162 @@ class ImageInfoApp:
         if not folder:
             return
 
-        for item in self.tree.get_children():
-            self.tree.delete(item)
-        self.item_to_path.clear()
-        self.all_files_data.clear()
+        # the old scanner is stopped first; what it still queues carries the old scan id
+        if self.scanner:
+            self.scanner.cancel()
+        self.scan_id += 1
+        self.channel.clear()
+        self.channel.reset_metrics()
+        self.store.clear()
+        self.table.clear()
 
         self.preview_label.config(image='', text="")
+        self.thumbnails.disk_dir = default_thumbnail_dir() if self.use_cache.get() else None
+
+        try:
+            workers = max(1, self.workers.get())
+        except tk.TclError:
+            workers = default_workers()
+        self.scanner = ImageScanner(workers=workers,
+                                    use_processes=self.pool_type.get() == "processes",
+                                    ordered=self.ordered.get())
 
         self.processing = True
         self.status_label.config(text="Searching for images...")
-        threading.Thread(target=self.process_images, args=(folder,), daemon=True).start()
-
-    def get_color_depth_info(self, img):
-        mode_to_bpp = {
-            "1": 1,
-            "L": 8,
-            "P": 8,
-            "RGB": 24,
-            "RGBA": 32,
-            "CMYK": 32,
-            "YCbCr": 24,
-            "LAB": 24,
-            "HSV": 24,
-            "I": 32,
-            "F": 32,
-        }
-        bpp = mode_to_bpp.get(img.mode, 0)
-        display_str = f"{bpp} bits" if bpp > 0 else "Unknown"
-        return display_str, bpp
-
-    def calculate_uncompressed_size(self, width, height, bpp):
-        if bpp == 0:
-            return 0
-        return (width * height * bpp) / 8
-
-    def calculate_compression_ratio(self, compressed_size, uncompressed_size):
-        if uncompressed_size == 0 or compressed_size == 0:
-            return "—"
-        ratio = uncompressed_size / compressed_size
-        return f"{ratio:.2f}:1"
-
-    def format_file_size(self, bytes_size):
-        if bytes_size == 0:
-            return '0 B'
-        for unit in ['B', 'KB', 'MB', 'GB']:
-            if bytes_size < 1024.0:
-                return f"{bytes_size:.2f} {unit}"
-            bytes_size /= 1024.0
-        return f"{bytes_size:.2f} TB"
-
-    def get_compression_type(self, img, filename):
-        ext = os.path.splitext(filename)[1].lower()
-        compression_map = {
-            '.jpg': 'JPEG',
-            '.jpeg': 'JPEG',
-            '.png': 'Deflate (PNG)',
-            '.gif': 'LZW (GIF)',
-            '.bmp': 'RLE / None (BMP)',
-            '.tif': 'TIFF',
-            '.tiff': 'TIFF',
-            '.pcx': 'RLE (PCX)'
-        }
-        return compression_map.get(ext, 'Unknown')
-
-    def process_images(self, folder):
-        supported_formats = ('.jpg', '.jpeg', '.gif', '.tif', '.tiff', '.bmp', '.png', '.pcx')
-        image_files = []
-        for root_dir, dirs, files in os.walk(folder):
-            for file in files:
-                if file.lower().endswith(supported_formats):
-                    image_files.append(os.path.join(root_dir, file))
-
-        total_files = len(image_files)
-        if total_files == 0:
-            self.root.after(0, lambda: messagebox.showinfo("No Images Found", 
-                                 "No supported image files were found in the selected folder."))
-            self.root.after(0, self.processing_finished)
-            return
+        threading.Thread(target=self.process_images,
+                         args=(folder, self.scanner, self.use_cache.get(), self.scan_id), daemon=True).start()
 
-        self.root.after(0, lambda: self.progress.config(maximum=total_files, value=0))
-        self.root.after(0, lambda: self.status_label.config(text=f"Found {total_files} files. Processing..."))
+    def process_images(self, folder, scanner, use_cache=False, scan_id=0):
+        channel = self.channel
+        walk = {'found': 0, 'done': False, 'errors': 0}
 
-        for idx, file_path in enumerate(image_files):
-            if not self.processing:
-                break
+        def walk_error(e):
+            walk['errors'] += 1
+            print(f"Error reading {e.filename}: {e}")
 
-            try:
-                with Image.open(file_path) as img:
-                    filename = os.path.basename(file_path)
-                    size_px = f"{img.width} x {img.height}"
-                    dpi = img.info.get('dpi', (0, 0))
-                    resolution = f"{dpi[0]} x {dpi[1]}" if dpi[0] and dpi[1] else "—"
-                    
-                    color_depth_str, bpp = self.get_color_depth_info(img)
-                    compression_type = self.get_compression_type(img, filename)
-                    
-                    compressed_size = os.path.getsize(file_path)
-                    
-                    uncompressed_size = self.calculate_uncompressed_size(img.width, img.height, bpp)
-                    compression_ratio = self.calculate_compression_ratio(compressed_size, uncompressed_size)
-                    
-                    compressed_size_str = self.format_file_size(compressed_size)
-                    uncompressed_size_str = self.format_file_size(uncompressed_size)
-                    
-                    info = {
-                        'filename': filename,
-                        'size_px': size_px,
-                        'resolution': resolution,
-                        'color_depth': color_depth_str,
-                        'compression': compression_type,
-                        'compression_ratio': compression_ratio,
-                        'full_path': file_path,
-                        'width': img.width,
-                        'height': img.height,
-                        'file_size': compressed_size_str,
-                        'uncompressed_size': uncompressed_size_str,
-                        'bpp': bpp
-                    }
-                    
-                    self.files_queue.append(info)
-                    self.all_files_data[file_path] = info
-
-                if idx % 50 == 0 or idx == len(image_files) - 1:
-                    self.root.after(0, self.update_ui)
+        def entries():
+            for entry in walk_images(folder, onerror=walk_error):
+                walk['found'] += 1
+                yield entry
+            walk['done'] = True
+            channel.call(self.for_scan, scan_id, self.walk_finished, walk['found'], scanner)
+
+        channel.call(self.for_scan, scan_id, self.walk_started)
 
+        if use_cache:
+            try:
+                scanner.cache = MetadataCache()
             except Exception as e:
-                print(f"Error processing {file_path}: {e}")
-
-            self.root.after(0, lambda: self.progress.config(value=idx+1))
-
-        self.root.after(0, self.processing_finished)
-
-    def update_ui(self):
-        while self.files_queue:
-            info = self.files_queue.popleft()
-            item_id = self.tree.insert("", tk.END, values=(
-                info['filename'],
-                info['size_px'],
-                info['resolution'],
-                info['color_depth'],
-                info['compression'],
-                info['compression_ratio'],
-                info['full_path']
-            ))
-            self.item_to_path[item_id] = info['full_path']
-
-    def processing_finished(self):
-        self.processing = False
-        self.status_label.config(text=f"Processing completed. Processed files: {self.progress['value']}")
+                print(f"Metadata cache disabled: {e}")
 
-    def on_select(self, event):
-        selection = self.tree.selection()
-        if not selection:
-            return
-            
-        item = selection[0]
-        file_path = self.item_to_path.get(item)
-        if file_path:
-            self.show_preview(file_path)
+        processed = 0
+        for file_path, header, error in scanner.scan(entries()):
+            if not self.processing or scanner.cancelled:
+                scanner.cancel()
+                break
+
+            if error is None:
+                channel.put((scan_id, header))
+            else:
+                print(f"Error processing {file_path}: {error}")
 
-    def on_double_click(self, event):
-        selection = self.tree.selection()
-        if not selection:
+            processed += 1
+            channel.set_progress((scan_id, walk['found'], processed, walk['done']))
+
+        cache = scanner.cache
+        if cache is not None:
+            # a directory that could not be listed would look like its files were deleted
+            if not scanner.cancelled and not walk['errors']:
+                cache.prune(folder)
+            cache.close()
+
+        if scanner.cancelled:
+            return
+        if walk['found'] == 0:
+            channel.call(self.for_scan, scan_id, messagebox.showinfo, "No Images Found",
+                         "No supported image files were found in the selected folder.")
+        channel.call(self.for_scan, scan_id, self.processing_finished, processed, cache.stats() if cache else None)
+
+    def for_scan(self, scan_id, func, *args):
+        # a cancelled scan's calls can still be queued after the next scan cleared the channel
+        if scan_id == self.scan_id:
+            func(*args)
+
+    def walk_started(self):
+        self.progress.config(mode='indeterminate', value=0)
+        self.progress.start(20)
+
+    def walk_finished(self, total_files, scanner):
+        self.progress.stop()
+        self.progress.config(mode='determinate', maximum=max(total_files, 1), value=0)
+        self.status_label.config(
+            text=f"Found {total_files} files. Processing with {scanner.workers} "
+                 f"{'processes' if scanner.use_processes else 'threads'}...")
+
+    def add_records(self, items):
+        for scan_id, header in items:
+            if scan_id == self.scan_id:
+                self.store.append(header)
+        self.table.refresh()
+
+    def show_progress(self, progress):
+        scan_id, found, processed, walk_done = progress
+        if scan_id != self.scan_id:
+            return
+        if walk_done:
+            self.progress.config(value=processed)
+        else:
+            self.status_label.config(text=f"Searching for images... Found {found} files so far, processed {processed}")
+
+    def schedule_filter(self, event=None):
+        if self.filter_job is not None:
+            self.root.after_cancel(self.filter_job)
+        self.filter_job = self.root.after(200, self.apply_filter)
+
+    def apply_filter(self):
+        self.filter_job = None
+        column = dict(COLUMNS).get(self.filter_column.get())
+        self.table.set_filter(column, self.filter_text.get())
+
+    def processing_finished(self, processed, cache_stats=None):
+        self.processing = False
+        self.progress.config(value=processed)
+        metrics = self.channel.metrics()
+        text = f"Processing completed. Processed files: {processed}"
+        if cache_stats:
+            text += (f" (cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+                     f"{cache_stats['pruned']} pruned)")
+        text += (f". UI feed: {metrics['throughput']:.0f} rows/s, "
+                 f"latency {metrics['mean_latency_ms']:.1f} ms avg / {metrics['max_latency_ms']:.1f} ms max")
+        self.status_label.config(text=text)
+
+    def show_statistics(self):
+        stats = self.store.stats()
+        if not stats['files']:
+            messagebox.showinfo("Statistics", "No images scanned yet.")
             return
-            
-        item = selection[0]
-        file_path = self.item_to_path.get(item)
+        lines = [
+            f"Files: {stats['files']}",
+            f"Total size: {format_file_size(stats['total_bytes'])}",
+            f"Uncompressed: {format_file_size(stats['uncompressed_bytes'])}",
+            "",
+        ]
+        for name, fmt in sorted(stats['formats'].items(), key=lambda item: -item[1]['total_bytes']):
+            lines.append(f"{name}: {fmt['files']} files, {format_file_size(fmt['total_bytes'])}, "
+                         f"mean ratio {fmt['mean_ratio']:.2f}:1")
+        metrics = self.channel.metrics()
+        lines += [
+            "",
+            f"UI feed: {metrics['items_out']} rows in {metrics['ticks']} ticks, "
+            f"{metrics['progress_coalesced']} progress updates coalesced",
+        ]
+        messagebox.showinfo("Statistics", "\n".join(lines))
+
+    def on_select(self, index):
+        self.show_preview(index)
+
+    def on_double_click(self, index):
+        file_path = self.store.path(index)
         if file_path:
             try:
                 if sys.platform.startswith('win'):
@@ -307,37 +319,55 @@ class ImageInfoApp:
             except Exception as e:
                 messagebox.showerror("Error", f"Cannot open file: {e}")
 
-    def show_preview(self, image_path):
-        try:
-            img = Image.open(image_path)
-            
-            max_size = 400
-            ratio = min(max_size / img.width, max_size / img.height)
-            new_size = (int(img.width * ratio), int(img.height * ratio))
-            
-            img_resized = img.resize(new_size, Image.Resampling.LANCZOS)
-            photo = ImageTk.PhotoImage(img_resized)
-            
-            self.preview_label.config(image=photo)
-            self.preview_label.image = photo
-            
-            info = self.all_files_data.get(image_path, {})
-            
-            text_lines = [
-                f"Size: {info.get('size_px', 'N/A')}",
-                f"File: {os.path.basename(image_path)}",
-                f"Compression: {info.get('compression', 'N/A')}",
-                f"Ratio: {info.get('compression_ratio', 'N/A')}",
-                f"File size: {info.get('file_size', 'N/A')}",
-                f"Uncompressed: {info.get('uncompressed_size', 'N/A')}"
-            ]
-            
-            self.preview_label.config(text="\n".join(text_lines), 
-                                    compound=tk.TOP)
-            
-        except Exception as e:
-            self.preview_label.config(image='', text=f"Error loading:\n{str(e)}")
-            print(f"Error loading preview {image_path}: {e}")
+    def show_preview(self, index):
+        image_path = self.store.path(index)
+        thumb = self.thumbnails.get(image_path)
+        if thumb is not None:
+            self.display_preview(index, thumb)
+        else:
+            self.preview_label.config(image='', text="Loading...")
+            self.preview_label.image = None
+            self.thumbnails.request(image_path, lambda path, img, error: self.channel.call(
+                self.preview_loaded, index, path, img, error))
+        self.prefetch_neighbours(index)
+
+    def prefetch_neighbours(self, index):
+        position = self.table.position_of(index)
+        if position is None:
+            return
+        positions = [position + offset for offset in PREFETCH_OFFSETS]
+        self.thumbnails.prefetch([self.store.path(self.table.record_at(p))
+                                  for p in positions if 0 <= p < len(self.table)])
+
+    def preview_loaded(self, index, image_path, img, error):
+        if self.table.selected != index or index >= len(self.store) or self.store.path(index) != image_path:
+            return
+        if error is not None:
+            self.preview_label.config(image='', text=f"Error loading:\n{str(error)}")
+            print(f"Error loading preview {image_path}: {error}")
+            return
+        self.display_preview(index, img)
+
+    def display_preview(self, index, img):
+        photo = ImageTk.PhotoImage(img)
+
+        self.preview_label.config(image=photo)
+        self.preview_label.image = photo
+
+        info = self.store.info(index)
+
+        text_lines = [
+            f"Size: {info.get('size_px', 'N/A')}",
+            f"File: {info.get('filename', 'N/A')}",
+            f"Compression: {info.get('compression', 'N/A')}",
+            f"Frames: {info.get('frames', 'N/A')}",
+            f"Ratio: {info.get('compression_ratio', 'N/A')}",
+            f"File size: {info.get('file_size', 'N/A')}",
+            f"Uncompressed: {info.get('uncompressed_size', 'N/A')}"
+        ]
+
+        self.preview_label.config(text="\n".join(text_lines), 
+                                compound=tk.TOP)
 
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,224 @@
+import os
+from array import array
+
+import numpy as np
+
+from scanner import uncompressed_size
+
+COLUMNS = [
+    ("Filename", 'filename'),
+    ("Size (px)", 'size_px'),
+    ("Resolution (dpi)", 'resolution'),
+    ("Color Depth", 'color_depth'),
+    ("Compression", 'compression'),
+    ("Compression Ratio", 'compression_ratio'),
+]
+
+
+def format_file_size(bytes_size):
+    if bytes_size == 0:
+        return '0 B'
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if bytes_size < 1024.0:
+            return f"{bytes_size:.2f} {unit}"
+        bytes_size /= 1024.0
+    return f"{bytes_size:.2f} TB"
+
+
+def format_color_depth(bpp):
+    return f"{bpp} bits" if bpp > 0 else "Unknown"
+
+
+def format_ratio(compressed_size, uncompressed_size):
+    if uncompressed_size == 0 or compressed_size == 0:
+        return "—"
+    ratio = uncompressed_size / compressed_size
+    return f"{ratio:.2f}:1"
+
+
+def format_resolution(dpi_x, dpi_y):
+    if not dpi_x or not dpi_y:
+        return "—"
+    return f"{round(dpi_x, 2):g} x {round(dpi_y, 2):g}"
+
+
+class RecordStore:
+    # One typed array per numeric field and small intern tables for the repeated strings;
+    # display strings are only built for the rows that are actually shown.
+    def __init__(self):
+        self.paths = []
+        self.width = array('I')
+        self.height = array('I')
+        # bits per pixel summed over samples, e.g. 320 for five float64 TIFF samples
+        self.bpp = array('H')
+        self.dpi_x = array('f')
+        self.dpi_y = array('f')
+        self.file_size = array('Q')
+        self.frames = array('I')
+        self.compression = array('H')
+        self.mode = array('H')
+        self.compression_names = []
+        self.mode_names = []
+        self._compression_codes = {}
+        self._mode_codes = {}
+
+    def __len__(self):
+        return len(self.paths)
+
+    def _intern(self, names, codes, value):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(names)
+            names.append(value)
+        return code
+
+    def append(self, header):
+        self.paths.append(header['full_path'])
+        self.width.append(header['width'])
+        self.height.append(header['height'])
+        self.bpp.append(header['bpp'])
+        self.dpi_x.append(header['dpi'][0])
+        self.dpi_y.append(header['dpi'][1])
+        self.file_size.append(header['file_size'])
+        self.frames.append(header.get('frames', 1))
+        self.compression.append(self._intern(self.compression_names, self._compression_codes, header['compression']))
+        self.mode.append(self._intern(self.mode_names, self._mode_codes, header['mode']))
+
+    def clear(self):
+        self.__init__()
+
+    def path(self, index):
+        return self.paths[index]
+
+    def info(self, index):
+        width, height, bpp = self.width[index], self.height[index], self.bpp[index]
+        compressed = self.file_size[index]
+        uncompressed = uncompressed_size(width, height, bpp)
+        return {
+            'filename': os.path.basename(self.paths[index]),
+            'size_px': f"{width} x {height}",
+            'resolution': format_resolution(self.dpi_x[index], self.dpi_y[index]),
+            'color_depth': format_color_depth(bpp),
+            'compression': self.compression_names[self.compression[index]],
+            'compression_ratio': format_ratio(compressed, uncompressed),
+            'full_path': self.paths[index],
+            'mode': self.mode_names[self.mode[index]],
+            'width': width,
+            'height': height,
+            'file_size': format_file_size(compressed),
+            'uncompressed_size': format_file_size(uncompressed),
+            'bpp': bpp,
+            'frames': self.frames[index]
+        }
+
+    def row(self, index):
+        width, height, bpp = self.width[index], self.height[index], self.bpp[index]
+        return (
+            os.path.basename(self.paths[index]),
+            f"{width} x {height}",
+            format_resolution(self.dpi_x[index], self.dpi_y[index]),
+            format_color_depth(bpp),
+            self.compression_names[self.compression[index]],
+            format_ratio(self.file_size[index], uncompressed_size(width, height, bpp)),
+        )
+
+    def column(self, name):
+        # a copy rather than np.frombuffer: a live buffer view would block further appends
+        return np.array(getattr(self, name))
+
+    def uncompressed_sizes(self):
+        return self.column('width').astype(np.float64) * self.column('height') * self.column('bpp') / 8
+
+    def ratios(self):
+        compressed = self.column('file_size').astype(np.float64)
+        uncompressed = self.uncompressed_sizes()
+        ratios = np.zeros(len(self))
+        np.divide(uncompressed, compressed, out=ratios, where=(compressed > 0) & (uncompressed > 0))
+        return ratios
+
+    def sort_keys(self, column, indices):
+        # keys of the given records alone, so that new records can be keyed as they come
+        indices = np.asarray(indices, dtype=np.intp)
+        if column == 'filename':
+            return np.array([os.path.basename(self.paths[i]).lower() for i in indices.tolist()], dtype=str)
+        if column == 'size_px':
+            return self.column('width')[indices].astype(np.uint64) * self.column('height')[indices]
+        if column == 'resolution':
+            return self.column('dpi_x')[indices]
+        if column == 'color_depth':
+            return self.column('bpp')[indices]
+        if column == 'compression':
+            names = np.array([name.lower() for name in self.compression_names], dtype=str)
+            return names[self.column('compression')[indices]]
+        if column == 'compression_ratio':
+            return self.ratios()[indices]
+        raise KeyError(column)
+
+    def sorted(self, indices, column, reverse=False):
+        # the records ordered by the column and their keys in that order; ties keep the
+        # order of `indices`, or its reverse with `reverse`
+        indices = np.asarray(indices, dtype=np.intp)
+        keys = self.sort_keys(column, indices)
+        order = np.argsort(keys, kind='stable')
+        if reverse:
+            order = order[::-1]
+        return indices[order], keys[order]
+
+    def merge_sorted(self, view, keys, new, column, reverse=False):
+        # insert records that all come after those of `view` into it, as sorted() made
+        # it from ascending indices; equal to sorting everything again, at the cost of
+        # keying only the new records
+        if reverse:
+            view, keys = view[::-1], keys[::-1]
+        new, new_keys = self.sorted(new, column)
+        at = np.searchsorted(keys, new_keys, side='right') + np.arange(len(new))
+        old = np.ones(len(view) + len(new), dtype=bool)
+        old[at] = False
+        merged = np.empty(len(old), dtype=np.intp)
+        merged_keys = np.empty(len(old), dtype=np.result_type(keys, new_keys))
+        merged[at], merged[old] = new, view
+        merged_keys[at], merged_keys[old] = new_keys, keys
+        if reverse:
+            return merged[::-1], merged_keys[::-1]
+        return merged, merged_keys
+
+    def filtered(self, indices, column, text):
+        text = text.lower()
+        if column == 'compression':
+            matches = np.array([text in name.lower() for name in self.compression_names], dtype=bool)
+            indices = np.asarray(indices, dtype=np.intp)
+            return indices[matches[self.column('compression')[indices]]].tolist() if len(matches) else []
+        if column == 'filename':
+            return [i for i in indices if text in os.path.basename(self.paths[i]).lower()]
+        if column is None:
+            return [i for i in indices if any(text in value.lower() for value in self.row(i))]
+        position = [key for _, key in COLUMNS].index(column)
+        return [i for i in indices if text in self.row(i)[position].lower()]
+
+    def stats(self):
+        count = len(self)
+        if not count:
+            return {'files': 0, 'total_bytes': 0, 'uncompressed_bytes': 0, 'formats': {}}
+        codes = self.column('compression')
+        file_size = self.column('file_size').astype(np.float64)
+        ratios = self.ratios()
+        known = ratios > 0
+        groups = len(self.compression_names)
+        files = np.bincount(codes, minlength=groups)
+        total = np.bincount(codes, weights=file_size, minlength=groups)
+        ratio_sum = np.bincount(codes, weights=ratios, minlength=groups)
+        ratio_count = np.bincount(codes, weights=known.astype(np.float64), minlength=groups)
+        formats = {}
+        for code, name in enumerate(self.compression_names):
+            formats[name] = {
+                'files': int(files[code]),
+                'total_bytes': int(total[code]),
+                'mean_ratio': float(ratio_sum[code] / ratio_count[code]) if ratio_count[code] else 0.0,
+            }
+        return {
+            'files': count,
+            'total_bytes': int(file_size.sum()),
+            'uncompressed_bytes': int(self.uncompressed_sizes().sum()),
+            'formats': formats,
+        }
+
@@ -0,0 +1,109 @@
+import argparse
+import os
+import sys
+import time
+
+# Only the standard library is imported at module level: `--help` and argument errors
+# return without loading Pillow, and tkinter/numpy are never imported on this path.
+
+FIELDS = ('path', 'width', 'height', 'mode', 'bpp', 'dpi_x', 'dpi_y', 'compression', 'frames',
+          'file_size', 'uncompressed_size', 'compression_ratio')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Write image header metadata for a folder as CSV or JSON Lines.")
+    parser.add_argument("folder", help="folder to scan recursively")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument("-f", "--format", choices=("csv", "jsonl"), default="csv")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of pool workers")
+    parser.add_argument("--processes", action="store_true", help="use a process pool instead of threads")
+    parser.add_argument("--ordered", action="store_true", help="keep the walk order in the output")
+    parser.add_argument("--cache", nargs="?", const="", default=None, metavar="PATH",
+                        help="use the metadata cache (default location if PATH is omitted)")
+    return parser.parse_args(argv)
+
+
+def to_record(header):
+    from scanner import uncompressed_size
+
+    uncompressed = uncompressed_size(header['width'], header['height'], header['bpp'])
+    compressed = header['file_size']
+    return {
+        'path': header['full_path'],
+        'width': header['width'],
+        'height': header['height'],
+        'mode': header['mode'],
+        'bpp': header['bpp'],
+        'dpi_x': header['dpi'][0],
+        'dpi_y': header['dpi'][1],
+        'compression': header['compression'],
+        'frames': header.get('frames', 1),
+        'file_size': compressed,
+        'uncompressed_size': int(uncompressed),
+        'compression_ratio': round(uncompressed / compressed, 4) if uncompressed and compressed else None,
+    }
+
+
+def make_writer(out, fmt):
+    if fmt == "csv":
+        import csv
+
+        writer = csv.DictWriter(out, fieldnames=FIELDS)
+        writer.writeheader()
+        return writer.writerow
+
+    import json
+
+    def write(record):
+        out.write(json.dumps(record, ensure_ascii=False))
+        out.write("\n")
+    return write
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    from scanner import scan_folder
+
+    cache = None
+    if args.cache is not None:
+        from metadata_cache import MetadataCache
+        cache = MetadataCache(args.cache or None)
+
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    write = make_writer(out, args.format)
+    start = time.perf_counter()
+    files = errors = 0
+    try:
+        for file_path, header, error in scan_folder(args.folder, workers=args.workers, use_processes=args.processes,
+                                                    ordered=args.ordered, cache=cache,
+                                                    onerror=lambda e: print(f"Error reading {e.filename}: {e}",
+                                                                            file=sys.stderr)):
+            files += 1
+            if error is None:
+                write(to_record(header))
+            else:
+                errors += 1
+                print(f"Error processing {file_path}: {error}", file=sys.stderr)
+    except KeyboardInterrupt:
+        print("Interrupted", file=sys.stderr)
+    except BrokenPipeError:
+        # the reader (e.g. `head`) went away; silence the flush at interpreter exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if cache is not None:
+            cache.close()
+
+    elapsed = time.perf_counter() - start
+    summary = f"Scanned {files} files ({errors} errors) in {elapsed:.2f} s, {files / elapsed if elapsed else 0:.0f} files/s"
+    if cache is not None:
+        stats = cache.stats()
+        summary += f"; cache: {stats['hits']} hits, {stats['misses']} misses, {stats['pruned']} pruned"
+    print(summary, file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
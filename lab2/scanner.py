@@ -0,0 +1,218 @@
+import os
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+from PIL import Image
+# importing the plugins up front and passing `formats` to Image.open keeps Pillow from
+# loading and probing every plugin it ships when a header cannot be identified
+from PIL import BmpImagePlugin, GifImagePlugin, JpegImagePlugin, PcxImagePlugin, PngImagePlugin, TiffImagePlugin
+
+from header_parser import parse_file
+
+SUPPORTED_FORMATS = ('.jpg', '.jpeg', '.gif', '.tif', '.tiff', '.bmp', '.png', '.pcx')
+PIL_FORMATS = ("JPEG", "PNG", "GIF", "TIFF", "BMP", "PCX")
+
+MODE_TO_BPP = {
+    "1": 1,
+    "L": 8,
+    "P": 8,
+    "RGB": 24,
+    "RGBA": 32,
+    "CMYK": 32,
+    "YCbCr": 24,
+    "LAB": 24,
+    "HSV": 24,
+    "I": 32,
+    "F": 32,
+}
+
+COMPRESSION_MAP = {
+    '.jpg': 'JPEG',
+    '.jpeg': 'JPEG',
+    '.png': 'Deflate (PNG)',
+    '.gif': 'LZW (GIF)',
+    '.bmp': 'RLE / None (BMP)',
+    '.tif': 'TIFF',
+    '.tiff': 'TIFF',
+    '.pcx': 'RLE (PCX)'
+}
+
+
+def default_workers(use_processes=False):
+    cpus = os.cpu_count() or 1
+    if use_processes:
+        return cpus
+    # header reads mostly wait on the disk, so keep more requests in flight than there are cores
+    return min(32, cpus + 4)
+
+
+def get_compression_type(filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return COMPRESSION_MAP.get(ext, 'Unknown')
+
+
+def walk_images(folder, extensions=SUPPORTED_FORMATS, onerror=None):
+    # breadth-first like os.walk, but yields files as soon as their directory is listed and
+    # reuses the DirEntry stat data instead of a separate os.stat/getsize per file
+    dirs = deque([folder])
+    while dirs:
+        directory = dirs.popleft()
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir():
+                            if not entry.is_symlink():
+                                dirs.append(entry.path)
+                        elif entry.name.lower().endswith(extensions):
+                            st = entry.stat()
+                            yield entry.path, st.st_size, st.st_mtime_ns
+                    except OSError as e:
+                        if onerror is not None:
+                            onerror(e)
+        except OSError as e:
+            if onerror is not None:
+                onerror(e)
+
+
+def uncompressed_size(width, height, bpp):
+    if bpp == 0:
+        return 0
+    return (width * height * bpp) / 8
+
+
+def _dpi_value(value):
+    value = float(value)
+    return int(value) if value.is_integer() else round(value, 2)
+
+
+def read_header(file_path, file_size=None, mtime_ns=None):
+    if file_size is None or mtime_ns is None:
+        st = os.stat(file_path)
+        file_size, mtime_ns = st.st_size, st.st_mtime_ns
+    with open(file_path, 'rb') as f:
+        # codec, page count and true bit depth come straight from the header bytes
+        details = parse_file(f) or {}
+        f.seek(0)
+        # Image.open only parses the header; pixel data is not decoded until load() is called
+        with Image.open(f, formats=PIL_FORMATS) as img:
+            dpi = img.info.get('dpi', (0, 0))
+            return {
+                'full_path': file_path,
+                'width': img.width,
+                'height': img.height,
+                'mode': img.mode,
+                'bpp': details.get('bit_depth') or MODE_TO_BPP.get(img.mode, 0),
+                'dpi': (_dpi_value(dpi[0]), _dpi_value(dpi[1])),
+                'compression': details.get('codec') or get_compression_type(file_path),
+                'frames': details.get('frames', 1),
+                'file_size': file_size,
+                'mtime_ns': mtime_ns,
+            }
+
+
+def read_headers(entries):
+    results = []
+    for file_path, file_size, mtime_ns in entries:
+        try:
+            results.append((file_path, read_header(file_path, file_size, mtime_ns), None))
+        except Exception as e:
+            results.append((file_path, None, str(e)))
+    return results
+
+
+def _as_entry(entry):
+    if isinstance(entry, str):
+        return entry, None, None
+    return entry
+
+
+def _done(results):
+    future = Future()
+    future.set_result(results)
+    return future
+
+
+class ImageScanner:
+    def __init__(self, workers=None, use_processes=False, ordered=False, chunk_size=None, max_pending=None,
+                 cache=None):
+        self.use_processes = use_processes
+        self.workers = workers or default_workers(use_processes)
+        self.ordered = ordered
+        # a process pool pays a pickling round trip per task, so hand it paths in batches
+        self.chunk_size = chunk_size or (16 if use_processes else 1)
+        self.max_pending = max_pending or self.workers * 4
+        self.cache = cache
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def _cached(self, file_path, file_size, mtime_ns):
+        if self.cache is None or file_size is None or mtime_ns is None:
+            return None
+        return self.cache.get(file_path, file_size, mtime_ns)
+
+    def _collect(self, pending):
+        if self.ordered:
+            results = pending.popleft().result()
+        else:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            results = []
+            for future in done:
+                pending.remove(future)
+                results.extend(future.result())
+        if self.cache is not None:
+            for _, header, error in results:
+                if error is None:
+                    self.cache.put(header)
+        return results
+
+    def scan(self, entries):
+        executor_cls = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        pending = deque() if self.ordered else set()
+        add = pending.append if self.ordered else pending.add
+        chunk = []
+        with executor_cls(max_workers=self.workers) as executor:
+            try:
+                for entry in entries:
+                    if self.cancelled:
+                        return
+                    file_path, file_size, mtime_ns = _as_entry(entry)
+                    header = self._cached(file_path, file_size, mtime_ns)
+                    if header is None:
+                        chunk.append((file_path, file_size, mtime_ns))
+                        if len(chunk) >= self.chunk_size:
+                            add(executor.submit(read_headers, chunk))
+                            chunk = []
+                    elif self.ordered:
+                        if chunk:
+                            add(executor.submit(read_headers, chunk))
+                            chunk = []
+                        add(_done([(file_path, header, None)]))
+                    else:
+                        yield file_path, header, None
+                    while len(pending) >= self.max_pending:
+                        yield from self._collect(pending)
+                if chunk:
+                    add(executor.submit(read_headers, chunk))
+                while pending and not self.cancelled:
+                    yield from self._collect(pending)
+            finally:
+                for future in pending:
+                    future.cancel()
+
+
+def scan_folder(folder, workers=None, use_processes=False, ordered=False, cache=None, onerror=None):
+    scanner = ImageScanner(workers=workers, use_processes=use_processes, ordered=ordered, cache=cache)
+    errors = []
+
+    def walk_error(e):
+        errors.append(e)
+        if onerror is not None:
+            onerror(e)
+
+    yield from scanner.scan(walk_images(folder, onerror=walk_error))
+    # a directory that could not be listed would look like its files were deleted
+    if cache is not None and not scanner.cancelled and not errors:
+        cache.prune(folder)
@@ -0,0 +1,144 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+DISPLAY_MODES = ("1", "L", "RGB", "RGBA")
+
+
+def default_thumbnail_dir():
+    return os.path.join(os.path.expanduser("~"), ".image_info_thumbnails")
+
+
+def make_thumbnail(image_path, max_size):
+    with Image.open(image_path) as img:
+        ratio = min(max_size / img.width, max_size / img.height)
+        new_size = (max(1, int(img.width * ratio)), max(1, int(img.height * ratio)))
+        # lets the JPEG decoder produce a 1/2..1/8 scaled image directly; a no-op for other formats
+        img.draft(None, new_size)
+        if img.mode not in DISPLAY_MODES:
+            img = img.convert("RGBA" if img.mode in ("P", "LA", "PA") or 'transparency' in img.info else "RGB")
+        # reducing_gap runs a cheap box reduce() before the LANCZOS pass on large images
+        return img.resize(new_size, Image.Resampling.LANCZOS, reducing_gap=2.0)
+
+
+def thumbnail_bytes(img):
+    return img.width * img.height * len(img.getbands())
+
+
+class ThumbnailCache:
+    def __init__(self, max_bytes=64 * 1024 * 1024, max_size=400, disk_dir=None, workers=2):
+        self.max_bytes = max_bytes
+        self.max_size = max_size
+        self.disk_dir = disk_dir
+        self.entries = OrderedDict()
+        self.size_bytes = 0
+        self.lock = threading.Lock()
+        self.pending = {}
+        self.loader = ThreadPoolExecutor(max_workers=workers)
+        # prefetch gets its own single worker so it never delays the row the user is looking at
+        self.prefetcher = ThreadPoolExecutor(max_workers=1)
+        self.prefetching = []
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, image_path):
+        with self.lock:
+            img = self.entries.get(image_path)
+            if img is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(image_path)
+            self.hits += 1
+            return img
+
+    def _store(self, image_path, img):
+        with self.lock:
+            old = self.entries.pop(image_path, None)
+            if old is not None:
+                self.size_bytes -= thumbnail_bytes(old)
+            self.entries[image_path] = img
+            self.size_bytes += thumbnail_bytes(img)
+            while self.size_bytes > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.size_bytes -= thumbnail_bytes(evicted)
+
+    def _disk_path(self, image_path):
+        st = os.stat(image_path)
+        key = f"{image_path}|{st.st_size}|{st.st_mtime_ns}|{self.max_size}".encode("utf-8", "surrogatepass")
+        return os.path.join(self.disk_dir, hashlib.sha1(key).hexdigest() + ".png")
+
+    def _load(self, image_path):
+        with self.lock:
+            img = self.entries.get(image_path)
+        if img is not None:
+            return img
+        disk_dir = self.disk_dir
+        disk_path = self._disk_path(image_path) if disk_dir else None
+        if disk_path and os.path.exists(disk_path):
+            with Image.open(disk_path) as stored:
+                img = stored.copy()
+        else:
+            img = make_thumbnail(image_path, self.max_size)
+            if disk_path:
+                try:
+                    os.makedirs(disk_dir, exist_ok=True)
+                    img.save(disk_path, "PNG", compress_level=1)
+                except OSError as e:
+                    print(f"Cannot store thumbnail for {image_path}: {e}")
+        self._store(image_path, img)
+        return img
+
+    def _submit(self, executor, image_path, foreground=False):
+        with self.lock:
+            future = self.pending.get(image_path)
+        if future is not None and not future.cancelled():
+            if not foreground or future.running() or future.done():
+                return future
+            # still queued behind other prefetches: move it to the foreground pool
+            future.cancel()
+        future = executor.submit(self._load, image_path)
+        with self.lock:
+            self.pending[image_path] = future
+        future.add_done_callback(lambda f: self._finished(image_path, f))
+        return future
+
+    def _finished(self, image_path, future):
+        with self.lock:
+            if self.pending.get(image_path) is future:
+                del self.pending[image_path]
+
+    def request(self, image_path, callback):
+        # callback(image_path, img, error) runs on a worker thread
+        def done(future):
+            if future.cancelled():
+                return
+            error = future.exception()
+            callback(image_path, None if error else future.result(), error)
+        self._submit(self.loader, image_path, foreground=True).add_done_callback(done)
+
+    def prefetch(self, paths):
+        for future in self.prefetching:
+            future.cancel()
+        self.prefetching = []
+        for image_path in paths:
+            with self.lock:
+                known = image_path in self.entries or image_path in self.pending
+            if not known:
+                self.prefetching.append(self._submit(self.prefetcher, image_path))
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'bytes': self.size_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def shutdown(self):
+        self.loader.shutdown(wait=False, cancel_futures=True)
+        self.prefetcher.shutdown(wait=False, cancel_futures=True)
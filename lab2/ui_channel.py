@@ -0,0 +1,130 @@
+import queue
+import threading
+import time
+import traceback
+
+ITEM = 0
+CALL = 1
+
+
+class UIChannel:
+    # Producer threads put items and control callbacks into one queue; a single periodic
+    # Tk `after` tick drains it within a time budget, hands the items to `consume` as one
+    # batch and applies only the latest progress value.
+    def __init__(self, root, consume, on_progress=None, interval_ms=30, budget_ms=8):
+        self.root = root
+        self.consume = consume
+        self.on_progress = on_progress
+        self.interval_ms = interval_ms
+        self.budget = budget_ms / 1000.0
+        self.queue = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.progress = None
+        self.job = None
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        self.started = time.perf_counter()
+        self.items_in = 0
+        self.items_out = 0
+        self.calls = 0
+        self.ticks = 0
+        self.progress_updates = 0
+        self.progress_coalesced = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def put(self, item):
+        self.items_in += 1
+        self.queue.put((ITEM, time.perf_counter(), item))
+
+    def call(self, func, *args):
+        self.queue.put((CALL, time.perf_counter(), (func, args)))
+
+    def set_progress(self, value):
+        with self.lock:
+            if self.progress is not None:
+                self.progress_coalesced += 1
+            self.progress = value
+
+    def clear(self):
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        with self.lock:
+            self.progress = None
+
+    def start(self):
+        if self.job is None:
+            self.job = self.root.after(self.interval_ms, self.tick)
+
+    def stop(self):
+        if self.job is not None:
+            self.root.after_cancel(self.job)
+            self.job = None
+
+    def tick(self):
+        try:
+            self.drain()
+        except Exception:
+            # a failing consumer or callback must not stop the channel; what is still
+            # queued goes out on the next tick
+            traceback.print_exc()
+        finally:
+            # stop() from inside a callback leaves the channel stopped
+            if self.job is not None:
+                self.job = self.root.after(self.interval_ms, self.tick)
+
+    def drain(self):
+        self.ticks += 1
+        now = time.perf_counter()
+        deadline = now + self.budget
+        batch = []
+        while now < deadline:
+            try:
+                kind, queued_at, payload = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            now = time.perf_counter()
+            latency = now - queued_at
+            self.latency_total += latency
+            self.latency_max = max(self.latency_max, latency)
+            if kind == ITEM:
+                batch.append(payload)
+                continue
+            # control callbacks must see every item that was queued before them
+            if batch:
+                self._deliver(batch)
+                batch = []
+            func, args = payload
+            self.calls += 1
+            func(*args)
+        if batch:
+            self._deliver(batch)
+
+        with self.lock:
+            progress, self.progress = self.progress, None
+        if progress is not None and self.on_progress:
+            self.progress_updates += 1
+            self.on_progress(progress)
+
+    def _deliver(self, batch):
+        self.items_out += len(batch)
+        self.consume(batch)
+
+    def metrics(self):
+        elapsed = time.perf_counter() - self.started
+        delivered = self.items_out + self.calls
+        return {
+            'items_in': self.items_in,
+            'items_out': self.items_out,
+            'backlog': self.items_in - self.items_out,
+            'ticks': self.ticks,
+            'throughput': self.items_out / elapsed if elapsed > 0 else 0.0,
+            'mean_latency_ms': self.latency_total / delivered * 1000 if delivered else 0.0,
+            'max_latency_ms': self.latency_max * 1000,
+            'progress_updates': self.progress_updates,
+            'progress_coalesced': self.progress_coalesced,
+        }
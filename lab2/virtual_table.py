@@ -0,0 +1,220 @@
+import tkinter as tk
+from tkinter import ttk
+
+import numpy as np
+
+
+class VirtualTable:
+    # Only the rows that fit in the widget exist as Treeview items; they are refilled
+    # from the store whenever the visible window moves, so the widget cost does not
+    # grow with the number of records.
+    def __init__(self, parent, columns, store, on_select=None, on_open=None, row_height=20):
+        self.columns = columns
+        self.store = store
+        self.on_select = on_select
+        self.on_open = on_open
+        self.row_height = row_height
+
+        # record indices in display order, or None for all records in store order;
+        # a sorted view keeps its sort keys alongside
+        self.view = None
+        self.view_keys = None
+        self.indexed = 0
+        self.top = 0
+        self.visible_rows = 15
+        self.selected = None
+        self.selected_position = None
+        self.sort_column = None
+        self.sort_reverse = False
+        self.filter_column = None
+        self.filter_text = ""
+
+        style = ttk.Style(parent)
+        style.configure("Virtual.Treeview", rowheight=row_height)
+
+        self.scrollbar = ttk.Scrollbar(parent, command=self.on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+
+        names = [name for name, _ in columns]
+        self.tree = ttk.Treeview(parent, columns=names, show="headings", style="Virtual.Treeview",
+                                 selectmode="browse", height=self.visible_rows)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        for name, key in columns:
+            self.tree.heading(name, text=name, command=lambda k=key: self.toggle_sort(k))
+
+        self.tree.bind("<Configure>", self.on_configure)
+        self.tree.bind("<<TreeviewSelect>>", self.on_tree_select)
+        self.tree.bind("<Double-1>", self.on_double_click)
+        self.tree.bind("<MouseWheel>", self.on_mousewheel)
+        self.tree.bind("<Button-4>", lambda e: self.scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda e: self.scroll_by(3))
+        self.tree.bind("<Up>", lambda e: self.move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self.move_selection(1))
+        self.tree.bind("<Prior>", lambda e: self.move_selection(-self.visible_rows))
+        self.tree.bind("<Next>", lambda e: self.move_selection(self.visible_rows))
+        self.tree.bind("<Home>", lambda e: self.move_selection(-len(self)))
+        self.tree.bind("<End>", lambda e: self.move_selection(len(self)))
+
+    def __len__(self):
+        return self.indexed if self.view is None else len(self.view)
+
+    def record_at(self, position):
+        return position if self.view is None else int(self.view[position])
+
+    def position_of(self, record):
+        if record is None:
+            return None
+        if self.view is None:
+            return record if record < self.indexed else None
+        # cached until the selection or the view changes
+        if self.selected_position is None or self.selected_position[0] != record:
+            found = np.flatnonzero(self.view == record)
+            self.selected_position = record, int(found[0]) if len(found) else None
+        return self.selected_position[1]
+
+    def set_view(self, view, keys=None):
+        self.view = view
+        self.view_keys = keys
+        self.selected_position = None
+
+    def clear(self):
+        # the store has been cleared; an active sort or filter goes on with an empty
+        # view, so that refresh() keeps merging the new records into it
+        self.top = 0
+        self.selected = None
+        self.rebuild_view()
+
+    def refresh(self):
+        # pick up records appended to the store since the last refresh
+        count = len(self.store)
+        if count == self.indexed:
+            return
+        new = np.arange(self.indexed, count)
+        self.indexed = count
+        if self.view is not None:
+            # only the new records are filtered and keyed, then merged into the view
+            if self.filter_text:
+                new = np.asarray(self.store.filtered(new, self.filter_column, self.filter_text), dtype=np.intp)
+            if self.sort_column is not None:
+                self.set_view(*self.store.merge_sorted(self.view, self.view_keys, new,
+                                                       self.sort_column, self.sort_reverse))
+            else:
+                self.set_view(np.concatenate([self.view, new]))
+        self.render()
+
+    def rebuild_view(self):
+        self.indexed = len(self.store)
+        if self.sort_column is None and not self.filter_text:
+            self.set_view(None)
+        else:
+            indices = np.arange(self.indexed)
+            if self.filter_text:
+                indices = np.asarray(self.store.filtered(indices, self.filter_column, self.filter_text), dtype=np.intp)
+            if self.sort_column is not None:
+                self.set_view(*self.store.sorted(indices, self.sort_column, self.sort_reverse))
+            else:
+                self.set_view(indices)
+        self.render()
+
+    def set_filter(self, column, text):
+        self.filter_column = column
+        self.filter_text = text.strip()
+        self.top = 0
+        self.rebuild_view()
+
+    def toggle_sort(self, column):
+        if self.sort_column == column:
+            self.sort_reverse = not self.sort_reverse
+        else:
+            self.sort_column = column
+            self.sort_reverse = False
+        for name, key in self.columns:
+            arrow = (" ▼" if self.sort_reverse else " ▲") if key == column else ""
+            self.tree.heading(name, text=name + arrow)
+        self.rebuild_view()
+
+    def render(self):
+        total = len(self)
+        self.top = max(0, min(self.top, total - self.visible_rows))
+        count = min(self.visible_rows, total - self.top)
+
+        items = self.tree.get_children()
+        if len(items) > count:
+            self.tree.delete(*items[count:])
+        for i in range(len(items), count):
+            self.tree.insert("", tk.END, iid=str(i))
+        for i in range(count):
+            self.tree.item(str(i), values=self.store.row(self.record_at(self.top + i)))
+
+        position = self.position_of(self.selected)
+        if position is not None and self.top <= position < self.top + count:
+            self.tree.selection_set(str(position - self.top))
+        elif self.tree.selection():
+            self.tree.selection_remove(*self.tree.selection())
+
+        if total:
+            self.scrollbar.set(self.top / total, (self.top + count) / total)
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll_to(self, top):
+        self.top = int(top)
+        self.render()
+
+    def scroll_by(self, rows):
+        self.scroll_to(self.top + rows)
+        return "break"
+
+    def on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * len(self))
+        elif args[0] == "scroll":
+            step = self.visible_rows if args[2] == "pages" else 1
+            self.scroll_by(int(args[1]) * step)
+
+    def on_mousewheel(self, event):
+        return self.scroll_by(-3 if event.delta > 0 else 3)
+
+    def on_configure(self, event):
+        items = self.tree.get_children()
+        bbox = self.tree.bbox(items[0]) if items else None
+        heading = bbox[1] if bbox else self.row_height + 4
+        rows = max(1, (event.height - heading) // self.row_height)
+        if rows != self.visible_rows:
+            self.visible_rows = rows
+            self.render()
+
+    def select_position(self, position):
+        total = len(self)
+        if not total:
+            return
+        position = max(0, min(position, total - 1))
+        if position < self.top:
+            self.top = position
+        elif position >= self.top + self.visible_rows:
+            self.top = position - self.visible_rows + 1
+        self.selected = self.record_at(position)
+        self.render()
+        if self.on_select:
+            self.on_select(self.selected)
+
+    def move_selection(self, delta):
+        position = self.position_of(self.selected)
+        self.select_position(self.top if position is None else position + delta)
+        return "break"
+
+    def on_tree_select(self, event):
+        selection = self.tree.selection()
+        if not selection:
+            return
+        record = self.record_at(self.top + int(selection[0]))
+        # render() re-selects the highlighted row, which fires this event again
+        if record != self.selected:
+            self.selected = record
+            if self.on_select:
+                self.on_select(record)
+
+    def on_double_click(self, event):
+        if self.selected is not None and self.on_open:
+            self.on_open(self.selected)
@@ -0,0 +1,152 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import cv2
+
+from pipeline import STAGES, Pipeline, read_image
+
+EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+JOURNAL_NAME = ".batch_done"
+# first line of the journal; the rest are the relative paths already written
+JOURNAL_HEADER = "# pipeline: "
+
+_pipeline = None
+
+
+def _init_worker(spec):
+    # each worker keeps one pipeline so its buffers are reused from image to image of the
+    # same size; a new size drops them, so mixed sizes do not add up
+    global _pipeline
+    cv2.setNumThreads(1)
+    _pipeline = Pipeline.from_string(spec)
+
+
+def process_file(src, dst):
+    img = read_image(src)
+    if img is None:
+        raise ValueError("не удалось прочитать изображение")
+    res = _pipeline.run(img)
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    # write next to the target and rename, so an interrupted write never looks finished
+    tmp = dst + ".part" + os.path.splitext(dst)[1]
+    if not cv2.imwrite(tmp, res):
+        raise ValueError("не удалось записать результат")
+    os.replace(tmp, dst)
+    return img.shape[1] * img.shape[0]
+
+
+def find_images(folder):
+    for dirpath, dirnames, filenames in os.walk(folder):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(EXTENSIONS):
+                path = os.path.join(dirpath, name)
+                yield os.path.relpath(path, folder)
+
+
+def canonical_spec(pipeline):
+    # "median" and "median:ksize=5" are the same pipeline
+    return "|".join(f"{stage.name}:" + ",".join(f"{key}={value}" for key, value in params.items())
+                    for stage, params in pipeline.stages)
+
+
+def load_journal(path, spec):
+    # None if the journal was written by a different pipeline
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        if f.readline().rstrip("\n") != JOURNAL_HEADER + spec:
+            return None
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a lab3 filter or pipeline to every image in a folder.")
+    parser.add_argument("input", help="folder with source images (scanned recursively)")
+    parser.add_argument("output", help="folder for the results, mirrors the input tree")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("-m", "--method", choices=sorted(STAGES), help="single filter")
+    group.add_argument("-p", "--pipeline", help='stages separated by "|", e.g. "median|otsu|max:size=5"')
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="images in flight at once (default: 2 per worker)")
+    parser.add_argument("--restart", action="store_true", help="ignore the journal and process everything again")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    spec = args.pipeline or args.method
+    try:
+        canonical = canonical_spec(Pipeline.from_string(spec))
+    except (KeyError, ValueError) as e:
+        print(f"Неверная цепочка {spec!r}: {e}", file=sys.stderr)
+        return 2
+    max_pending = args.max_pending or args.workers * 2
+
+    os.makedirs(args.output, exist_ok=True)
+    journal_path = os.path.join(args.output, JOURNAL_NAME)
+    if args.restart and os.path.exists(journal_path):
+        os.remove(journal_path)
+    done = load_journal(journal_path, canonical)
+    if done is None:
+        print(f"{args.output} уже содержит результаты другой цепочки; запустите с --restart, "
+              f"чтобы обработать всё заново", file=sys.stderr)
+        return 2
+
+    processed = skipped = errors = pixels = 0
+    start = time.perf_counter()
+    journal = open(journal_path, "a", encoding="utf-8")
+    if journal.tell() == 0:
+        journal.write(JOURNAL_HEADER + canonical + "\n")
+        journal.flush()
+    pool = ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(spec,))
+    pending = {}
+
+    def collect(futures):
+        nonlocal processed, errors, pixels
+        for future in futures:
+            rel = pending.pop(future)
+            try:
+                pixels += future.result()
+            except Exception as e:
+                errors += 1
+                print(f"Ошибка обработки {rel}: {e}", file=sys.stderr)
+                continue
+            processed += 1
+            journal.write(rel + "\n")
+            journal.flush()
+
+    try:
+        for rel in find_images(args.input):
+            if rel in done and os.path.exists(os.path.join(args.output, rel)):
+                skipped += 1
+                continue
+            if len(pending) >= max_pending:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+            future = pool.submit(process_file, os.path.join(args.input, rel), os.path.join(args.output, rel))
+            pending[future] = rel
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(finished)
+    except KeyboardInterrupt:
+        print("Прервано, повторный запуск продолжит с места остановки", file=sys.stderr)
+        for future in pending:
+            future.cancel()
+    finally:
+        pool.shutdown(wait=True)
+        journal.close()
+
+    elapsed = time.perf_counter() - start
+    print(f"Обработано {processed} изображений ({skipped} пропущено, {errors} ошибок) за {elapsed:.2f} с, "
+          f"{processed / elapsed if elapsed else 0:.1f} изобр./с, {pixels / elapsed / 1e6 if elapsed else 0:.1f} Мп/с",
+          file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from lab3 import (адаптивная_пороговая, глобальная_пороговая, медианный_фильтр, пороговая_отсу,
+                  фильтр_максимума, фильтр_минимума)
+from pipeline import Pipeline, space_of
+from threshold_analysis import ThresholdAnalysis
+from tiled import run_tiled
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+REFERENCE = {
+    'median': медианный_фильтр,
+    'min': фильтр_минимума,
+    'max': фильтр_максимума,
+    'global': глобальная_пороговая,
+    'otsu': пороговая_отсу,
+    'adaptive': адаптивная_пороговая,
+}
+ANALYSIS = {
+    'global': lambda img: ThresholdAnalysis(img).global_threshold(127),
+    'otsu': lambda img: ThresholdAnalysis(img).otsu(),
+    'adaptive': lambda img: ThresholdAnalysis(img).adaptive_mean(11, 2),
+}
+# chains of 2-4 stages, so a mismatch in the buffers or conversions between stages shows up
+CHAINS = ["median|max", "min|global", "max|otsu|median", "median|adaptive|min", "min|max|median|global",
+          "global|max|otsu"]
+DTYPES = {'uint8': np.uint8, 'uint16': np.uint16, 'float32': np.float32}
+
+
+def make_image(width, height, channels, dtype, seed):
+    rng = np.random.default_rng(seed)
+    shape = (height, width, channels) if channels > 1 else (height, width)
+    # smooth structure with sparse noise, so the thresholds have something to separate
+    img = cv2.GaussianBlur(rng.integers(0, 256, shape, np.uint8), (0, 0), 3)
+    noise = rng.random(shape[:2]) < 0.05
+    img[noise] = rng.integers(0, 256, (int(noise.sum()),) + shape[2:], np.uint8)
+    if dtype == np.uint16:
+        return img.astype(np.uint16) * 257
+    if dtype == np.float32:
+        # measured data rather than 0..1, as in scientific float TIFFs, spread unevenly so
+        # the threshold levels do not fall exactly on pixel values
+        return np.square(img.astype(np.float32)) / 16 - 800
+    return img
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def measure(func, img, repeat):
+    result = func(img)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(img)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    func(img)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(times)
+    megapixels = img.shape[0] * img.shape[1] / 1e6
+    return result, {
+        'seconds': round(best, 6),
+        'mp_per_sec': round(megapixels / best, 2) if best > 0 else None,
+        'alloc_peak_mb': round((peak - base) / (1024 * 1024), 2),
+        'alloc_retained_mb': round((current - base) / (1024 * 1024), 2),
+    }
+
+
+def same(a, b):
+    if a.shape != b.shape and a.ndim == 3 and b.ndim == 2:
+        # a threshold keeps three equal channels in the reference functions
+        a = a[..., 0]
+    return a.shape == b.shape and a.dtype == b.dtype and bool(np.array_equal(a, b))
+
+
+def chain_reference(chain):
+    names = chain.split("|")
+
+    def reference(src):
+        for name in names:
+            if src.ndim == 2 and name in ANALYSIS:
+                # the reference thresholds expect BGR; a gray image is given as three equal channels
+                src = cv2.cvtColor(src, cv2.COLOR_GRAY2BGR)
+            src = REFERENCE[name](src)
+        return src
+    return reference
+
+
+def parse_chains(text):
+    chains = [v for v in text.split(",") if v]
+    for chain in chains:
+        if not all(name in REFERENCE for name in chain.split("|")):
+            raise argparse.ArgumentTypeError(f"unknown operation in {chain}")
+    return chains
+
+
+def variants(name, img, tile):
+    pipeline = Pipeline.from_string(name, output=space_of(img))
+    yield 'pipeline', pipeline.run
+    yield 'tiled', lambda src: run_tiled(src, Pipeline.from_string(name, output=space_of(img)), tile=tile)
+    if name in ANALYSIS and img.dtype == np.uint8:
+        yield 'analysis', ANALYSIS[name]
+
+
+def bench_case(name, img, repeat, tile):
+    case = {}
+    try:
+        expected, case['reference'] = measure(chain_reference(name), img, repeat)
+    except (cv2.error, ValueError, TypeError) as e:
+        expected = None
+        case['reference'] = {'error': str(e).strip().splitlines()[-1]}
+    for variant, func in variants(name, img, tile):
+        try:
+            result, case[variant] = measure(func, img, repeat)
+        except (cv2.error, ValueError, TypeError) as e:
+            case[variant] = {'error': str(e).strip().splitlines()[-1]}
+            continue
+        case[variant]['matches_reference'] = same(expected, result) if expected is not None else None
+    return case
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(args):
+    results = []
+    mismatches = 0
+    for width, height in args.sizes:
+        for channels in args.channels:
+            for dtype_name in args.dtypes:
+                img = make_image(width, height, channels, DTYPES[dtype_name], args.seed)
+                for name in args.ops + args.chains:
+                    case = bench_case(name, img, args.repeat, args.tile)
+                    results.append({'op': name, 'size': f"{width}x{height}", 'channels': channels,
+                                    'dtype': dtype_name, **case})
+                    cells = []
+                    for variant, stats in case.items():
+                        if 'error' in stats:
+                            cells.append(f"{variant} n/a")
+                            continue
+                        flag = {True: "", False: " MISMATCH", None: ""}[stats.get('matches_reference')]
+                        mismatches += stats.get('matches_reference') is False
+                        cells.append(f"{variant} {stats['mp_per_sec']} MP/s{flag}")
+                    print(f"{name:21} {width}x{height} c{channels} {dtype_name:7}: " + ", ".join(cells))
+
+    report = {
+        'benchmark': "lab3-filters",
+        'timestamp': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'repeat': args.repeat,
+        'tile': args.tile,
+        'results': results,
+        'mismatches': mismatches,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output} ({mismatches} mismatches)")
+    return report
+
+
+def parse_size(text):
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the lab3 filters and check them against the reference functions.")
+    parser.add_argument("--sizes", default="640x480,1920x1080,4000x3000",
+                        type=lambda s: [parse_size(v) for v in s.split(",")], help="comma-separated WxH list")
+    parser.add_argument("--channels", default="1,3", type=lambda s: sorted({int(v) for v in s.split(",")}))
+    parser.add_argument("--dtypes", default="uint8,uint16,float32",
+                        type=lambda s: [v for v in s.split(",") if v in DTYPES], help="uint8, uint16, float32")
+    parser.add_argument("--ops", default=",".join(REFERENCE),
+                        type=lambda s: [v for v in s.split(",") if v in REFERENCE], help="comma-separated operations")
+    parser.add_argument("--chains", default=",".join(CHAINS), type=parse_chains,
+                        help="comma-separated chains of operations joined by |, checked as a whole")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per case (best is reported)")
+    parser.add_argument("--tile", type=int, default=1024, help="tile side for the tiled mode")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-o", "--output", default="bench_results.json")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    report = run(parse_args())
+    sys.exit(1 if report['mismatches'] else 0)
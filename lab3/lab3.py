@@ -1,45 +1,167 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
 import numpy as np  
 import tkinter as tk
 from tkinter import filedialog, ttk, messagebox
 from PIL import Image, ImageTk
 
-def медианный_фильтр(img):
-    return cv2.medianBlur(img, 5)
+from memo import ResultCache, image_digest
+from pipeline import PARAMS, Pipeline, describe_stage, read_image, stage_by_title
+from stream import FrameStream
+from threshold_analysis import (ThresholdAnalysis, adaptive_mean_threshold, gray_histogram, is_float, level,
+                                max_value, otsu_value, value_range)
+
+def медианный_фильтр(img, ksize=5):
+    return cv2.medianBlur(img, ksize)
 
-def фильтр_минимума(img):
-    kernel = np.ones((3, 3), np.uint8)
+def фильтр_минимума(img, size=3):
+    kernel = np.ones((size, size), np.uint8)
     return cv2.erode(img, kernel)
 
-def фильтр_максимума(img):
-    kernel = np.ones((3, 3), np.uint8)
+def фильтр_максимума(img, size=3):
+    kernel = np.ones((size, size), np.uint8)
     return cv2.dilate(img, kernel)
 
-def глобальная_пороговая(img):
+def глобальная_пороговая(img, thresh=127):
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    _, th = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY)
+    _, th = cv2.threshold(gray, level(thresh, value_range(gray)), max_value(gray.dtype), cv2.THRESH_BINARY)
     return cv2.cvtColor(th, cv2.COLOR_GRAY2BGR)
 
 def пороговая_отсу(img):
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    if is_float(gray.dtype):
+        # OpenCV's Otsu is 8- and 16-bit only
+        span = value_range(gray)
+        value = otsu_value(gray_histogram(gray, span), gray.dtype, span)
+        _, th = cv2.threshold(gray, value, max_value(gray.dtype), cv2.THRESH_BINARY)
+    else:
+        _, th = cv2.threshold(gray, 0, max_value(gray.dtype), cv2.THRESH_BINARY + cv2.THRESH_OTSU)
     return cv2.cvtColor(th, cv2.COLOR_GRAY2BGR)
 
-def адаптивная_пороговая(img):
+def адаптивная_пороговая(img, block=11, c=2):
     gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    if gray.dtype != np.uint8:
+        return cv2.cvtColor(adaptive_mean_threshold(gray, block, c), cv2.COLOR_GRAY2BGR)
     th = cv2.adaptiveThreshold(
         gray, 255,
         cv2.ADAPTIVE_THRESH_MEAN_C,
-        cv2.THRESH_BINARY, 11, 2
+        cv2.THRESH_BINARY, block, c
     )
     return cv2.cvtColor(th, cv2.COLOR_GRAY2BGR)
 
+def to_8bit(img, span=None):
+    # for display only, and only ever applied to an image already scaled to the panel;
+    # float images are mapped from `span`, by default their own value range
+    if img.dtype == np.uint16:
+        return (img >> 8).astype(np.uint8)
+    if img.dtype != np.uint8:
+        lo, hi = span or value_range(img)
+        return (np.clip((img - lo) / (hi - lo), 0.0, 1.0) * 255 + 0.5).astype(np.uint8)
+    return img
+
+def parse_numbers(text, cast=int):
+    return [cast(item) for item in text.replace(";", ",").split(",") if item.strip()]
+
+class ИсследованиеПорогов:
+    THUMB = 180
+    COLUMNS = 4
+
+    def __init__(self, root, img):
+        self.window = tk.Toplevel(root)
+        self.window.title("Сравнение пороговых методов")
+        self.window.geometry("820x640")
+        # everything below is derived from one grayscale image, histogram and integral image
+        self.analysis = ThresholdAnalysis(img)
+        self.images = []
+
+        top = ttk.Frame(self.window, padding=5)
+        top.pack(fill="x")
+        self.thresholds = tk.StringVar(value="64, 96, 127, 160, 192")
+        self.blocks = tk.StringVar(value="11, 25, 51")
+        self.constants = tk.StringVar(value="2, 5")
+        for label, var in (("Пороги", self.thresholds), ("Блоки", self.blocks), ("C", self.constants)):
+            ttk.Label(top, text=label).pack(side="left", padx=(5, 2))
+            entry = ttk.Entry(top, textvariable=var, width=18)
+            entry.pack(side="left")
+            entry.bind("<Return>", lambda event: self.update())
+        ttk.Button(top, text="Показать", command=self.update).pack(side="left", padx=5)
+        self.status = tk.StringVar(value="")
+        ttk.Label(self.window, textvariable=self.status, padding=(10, 0)).pack(fill="x")
+
+        self.canvas = tk.Canvas(self.window, highlightthickness=0)
+        scrollbar = ttk.Scrollbar(self.window, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=scrollbar.set)
+        scrollbar.pack(side="right", fill="y")
+        self.canvas.pack(side="left", fill="both", expand=True)
+        self.grid = ttk.Frame(self.canvas)
+        self.canvas.create_window((0, 0), window=self.grid, anchor="nw")
+        self.grid.bind("<Configure>", lambda event: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
+
+        self.update()
+
+    def variants(self):
+        a = self.analysis
+        thresholds = parse_numbers(self.thresholds.get(), float)
+        shares = a.foreground_share(thresholds)
+        for t, share in zip(thresholds, shares):
+            yield f"Порог {t:g} ({share:.0%})", lambda t=t: a.global_threshold(t)
+        yield f"Отсу (порог {a.otsu_label()})", a.otsu
+        for block in parse_numbers(self.blocks.get()):
+            for c in parse_numbers(self.constants.get(), float):
+                yield f"Среднее {block}, C={c:g}", lambda block=block, c=c: a.adaptive_mean(block, c)
+                yield f"Гаусс {block}, C={c:g}", lambda block=block, c=c: a.adaptive_gaussian(block, c)
+
+    def update(self):
+        try:
+            variants = list(self.variants())
+        except ValueError as e:
+            messagebox.showerror("Ошибка", f"Неверные параметры: {e}", parent=self.window)
+            return
+        for child in self.grid.winfo_children():
+            child.destroy()
+        self.images = []
+
+        start = time.perf_counter()
+        h, w = self.analysis.gray.shape
+        scale = min(self.THUMB / w, self.THUMB / h, 1.0)
+        size = (max(1, int(w * scale)), max(1, int(h * scale)))
+        for i, (caption, compute) in enumerate(variants):
+            try:
+                res = compute()
+            except ValueError as e:
+                caption, res = f"{caption}: {e}", np.zeros((h, w), self.analysis.dtype)
+            thumb = to_8bit(cv2.resize(res, size, interpolation=cv2.INTER_AREA), (0, self.analysis.top))
+            img_tk = ImageTk.PhotoImage(Image.fromarray(thumb))
+            self.images.append(img_tk)
+            cell = ttk.Frame(self.grid, padding=4)
+            cell.grid(row=i // self.COLUMNS, column=i % self.COLUMNS)
+            ttk.Label(cell, image=img_tk).pack()
+            ttk.Label(cell, text=caption, wraplength=self.THUMB).pack()
+        elapsed = time.perf_counter() - start
+        self.status.set(f"{len(variants)} вариантов за {elapsed * 1000:.0f} мс ({w}x{h})")
+
 class Приложение:
     def __init__(self, root):
         self.root = root
         self.root.title("Нелинейные фильтры и пороговая обработка")
         self.root.geometry("1000x600")
         self.img = None
+        self.proxy = None
+        self.generation = 0
+        self.render_job = None
+        # one worker, so the full-resolution pipeline and its buffers are only used there
+        self.worker = ThreadPoolExecutor(max_workers=1)
+        self.proxy_pipeline = Pipeline()
+        self.full_pipeline = Pipeline()
+        self.results = ResultCache()
+        self.digest = None
+        self.span = None
+        self.proxy_digest = None
+        self.stream = None
+        self.stream_preview = None
 
         left = ttk.Frame(root, padding=10)
         left.pack(side="left", fill="y")
@@ -51,7 +173,7 @@ class Приложение:
 
         self.method = tk.StringVar(value="Медианный фильтр")
 
-        ttk.Combobox(
+        methods = ttk.Combobox(
             frame,
             state="readonly",
             textvariable=self.method,
@@ -63,10 +185,36 @@ class Приложение:
                 "Пороговая по Отсу",
                 "Адаптивная пороговая"
             ]
-        ).pack(fill="x", pady=5)
+        )
+        methods.pack(fill="x", pady=5)
+        methods.bind("<<ComboboxSelected>>", self.on_method_selected)
+
+        self.params_frame = ttk.LabelFrame(frame, text="Параметры")
+        self.params_frame.pack(fill="x", pady=5)
+        self.param_vars = {}
+        self.build_params()
 
         ttk.Button(frame, text="Применить", command=self.apply).pack(fill="x", pady=5)
 
+        chain = ttk.LabelFrame(left, text="Цепочка")
+        chain.pack(fill="x", pady=10)
+
+        self.pipeline = Pipeline()
+        self.chain_list = tk.Listbox(chain, height=6)
+        self.chain_list.pack(fill="x", pady=5)
+        ttk.Button(chain, text="Добавить в цепочку", command=self.add_to_chain).pack(fill="x", pady=2)
+        ttk.Button(chain, text="Очистить цепочку", command=self.clear_chain).pack(fill="x", pady=2)
+
+        ttk.Button(left, text="Сравнить пороги", command=self.open_explorer).pack(fill="x", pady=5)
+
+        video = ttk.LabelFrame(left, text="Видео")
+        video.pack(fill="x", pady=10)
+        ttk.Button(video, text="Обработать видео…", command=self.start_video).pack(fill="x", pady=2)
+        ttk.Button(video, text="Остановить", command=self.stop_video).pack(fill="x", pady=2)
+
+        self.status = tk.StringVar(value="")
+        ttk.Label(left, textvariable=self.status, wraplength=180).pack(fill="x", pady=10)
+
         right = ttk.Frame(root, padding=10)
         right.pack(side="right", fill="both", expand=True)
 
@@ -79,20 +227,30 @@ class Приложение:
     def load_image(self):
         path = filedialog.askopenfilename(
             title="Выберите изображение",
-            filetypes=[("Изображения", "*.jpg *.jpeg *.png *.bmp")]
+            filetypes=[("Изображения", "*.jpg *.jpeg *.png *.bmp *.tif *.tiff")]
         )
         if not path:
             return
 
-        img = cv2.imread(path)
+        img = read_image(path)
         if img is None:
             messagebox.showerror("Ошибка", "Не удалось загрузить изображение")
             return
 
         self.img = img
-        self.show(self.img, self.panel_orig)
+        self.generation += 1
+        # the panel-sized copy is made once per image: it is what the original panel shows
+        # and what previews are computed on
+        w, h = self.panel_size(self.panel_orig)
+        self.proxy = self.fit_image(img, w, h) if img.shape[1] > w or img.shape[0] > h else img
+        self.digest = image_digest(img)
+        self.proxy_digest = image_digest(self.proxy)
+        # float results are shown through the range of the whole source image
+        self.span = value_range(img) if is_float(img.dtype) else None
+        self.show(self.proxy, self.panel_orig, self.span)
         self.panel_res.configure(image="", text="Результат")
         self.panel_res.image = None
+        self.status.set("")
 
     def fit_image(self, img, max_w, max_h):
         h, w = img.shape[:2]
@@ -100,44 +258,233 @@ class Приложение:
         new_size = (int(w * scale), int(h * scale))
         return cv2.resize(img, new_size, interpolation=cv2.INTER_AREA)
 
-    def show(self, img, panel):
+    def panel_size(self, panel):
         panel.update_idletasks()
         w = panel.winfo_width()
         h = panel.winfo_height()
         if w < 10 or h < 10:
             w, h = 450, 450
+        return w, h
 
-        img = self.fit_image(img, w, h)
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    def show(self, img, panel, span=None):
+        w, h = self.panel_size(panel)
+        if img.shape[1] != w and img.shape[0] != h:
+            img = self.fit_image(img, w, h)
+        img = to_8bit(img, span)
+        if img.ndim == 3:
+            img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
         img = Image.fromarray(img)
         img_tk = ImageTk.PhotoImage(img)
 
         panel.configure(image=img_tk, text="")
         panel.image = img_tk
 
+    def build_params(self):
+        for child in self.params_frame.winfo_children():
+            child.destroy()
+        self.param_vars = {}
+        stage = stage_by_title(self.method.get())
+        if not stage.defaults:
+            ttk.Label(self.params_frame, text="Нет параметров").pack(fill="x")
+            return
+        for key, default in stage.defaults.items():
+            label, low, high, step = PARAMS[key]
+            var = tk.IntVar(value=default)
+            self.param_vars[key] = var
+            ttk.Label(self.params_frame, text=label).pack(fill="x")
+            spin = ttk.Spinbox(self.params_frame, from_=low, to=high, increment=step, textvariable=var,
+                               command=self.on_params_changed)
+            spin.pack(fill="x", pady=2)
+            spin.bind("<Return>", self.on_params_changed)
+
+    def current_params(self):
+        stage = stage_by_title(self.method.get())
+        params = {}
+        for key, var in self.param_vars.items():
+            _, low, high, step = PARAMS[key]
+            try:
+                value = var.get()
+            except tk.TclError:
+                value = stage.defaults[key]
+            value = min(max(value, low), high)
+            if step == 2 and value % 2 == 0:
+                value += 1 if value < high else -1
+            var.set(value)
+            params[key] = value
+        return params
+
+    def on_params_changed(self, event=None):
+        self.on_method_selected()
+
+    def add_to_chain(self):
+        stage = stage_by_title(self.method.get())
+        params = self.current_params()
+        self.pipeline.add(stage.name, params)
+        self.chain_list.insert("end", describe_stage(stage, params))
+        if self.img is not None:
+            self.render()
+
+    def clear_chain(self):
+        self.pipeline.clear()
+        self.chain_list.delete(0, "end")
+
+    def open_explorer(self):
+        if self.img is None:
+            messagebox.showwarning("Ошибка", "Сначала загрузите изображение")
+            return
+        # compared on the full image, so block sizes and C act at the scale "Применить" uses;
+        # the histogram and integral image are shared by all variants, only thumbnails are scaled
+        ИсследованиеПорогов(self.root, self.img)
+
+    def start_video(self):
+        if self.stream is not None:
+            messagebox.showwarning("Ошибка", "Видео уже обрабатывается")
+            return
+        source = filedialog.askopenfilename(
+            title="Выберите видео",
+            filetypes=[("Видео", "*.avi *.mp4 *.mkv *.mov"), ("Все файлы", "*.*")]
+        )
+        if not source:
+            return
+        output = filedialog.asksaveasfilename(
+            title="Сохранить результат",
+            defaultextension=".avi",
+            filetypes=[("AVI", "*.avi"), ("MP4", "*.mp4")]
+        )
+        if not output:
+            return
+
+        w, h = self.panel_size(self.panel_res)
+        stages = Pipeline([(stage.name, params) for stage, params in self.current_stages()])
+        # the worker threads only hand over the latest downscaled frame; the Tk side polls it
+        self.stream = FrameStream(source, output, stages, on_preview=self.store_preview, preview_size=(w, h))
+        self.stream_preview = None
+        threading.Thread(target=self.run_video, args=(self.stream,), daemon=True).start()
+        self.root.after(100, self.poll_video, self.stream)
+
+    def store_preview(self, index, img):
+        self.stream_preview = img
+
+    def run_video(self, stream):
+        try:
+            stream.run()
+        except Exception as e:
+            stream.error = stream.error or e
+            # a source that does not open fails before the stream marks itself finished
+            stream.finished = stream.finished or time.perf_counter()
+
+    def stop_video(self):
+        if self.stream is not None:
+            self.stream.stop()
+
+    def poll_video(self, stream):
+        preview, self.stream_preview = self.stream_preview, None
+        if preview is not None:
+            self.show(preview, self.panel_res)
+        stats = stream.stats()
+        if stream.finished is None:
+            self.status.set(f"Видео: {stats['frames']} кадров, {stats['fps']:.1f} к/с")
+            self.root.after(100, self.poll_video, stream)
+            return
+        self.stream = None
+        if stream.error is not None:
+            messagebox.showerror("Ошибка", f"Не удалось обработать видео: {stream.error}")
+        self.status.set(f"Видео готово: {stats['frames']} кадров за {stats['seconds']:.1f} с, {stats['fps']:.1f} к/с")
+
+    def current_stages(self):
+        # a non-empty chain runs as a whole, otherwise the selected method alone
+        if len(self.pipeline):
+            return list(self.pipeline.stages)
+        return Pipeline([(stage_by_title(self.method.get()).name, self.current_params())]).stages
+
+    def on_method_selected(self, event=None):
+        if event is not None:
+            self.build_params()
+        if self.img is not None and not len(self.pipeline):
+            self.render()
+
     def apply(self):
         if self.img is None:
             messagebox.showwarning("Ошибка", "Сначала загрузите изображение")
             return
+        self.render()
+
+    def render(self):
+        # the proxy result is shown at once; the full-resolution one follows from the worker
+        # unless another render has been started by then
+        self.generation += 1
+        stages = self.current_stages()
+        if self.render_job is not None:
+            self.root.after_cancel(self.render_job)
+            self.render_job = None
+
+        full = self.results.get(self.digest, stages)
+        if full is not None:
+            self.show(full, self.panel_res, self.result_span(stages))
+            self.status.set(f"Результат из кэша. {self.cache_summary()}")
+            return
+
+        preview = self.results.get(self.proxy_digest, stages)
+        if preview is None:
+            self.proxy_pipeline.stages = stages
+            try:
+                preview = self.proxy_pipeline.run(self.proxy).copy()
+            except (ValueError, cv2.error) as e:
+                messagebox.showerror("Ошибка", f"Не удалось обработать изображение: {e}")
+                return
+            self.results.put(self.proxy_digest, stages, preview)
+        self.show(preview, self.panel_res, self.result_span(stages))
+        self.status.set("Предпросмотр, идёт полная обработка…")
+        self.render_job = self.root.after(250, self.start_full_render, self.generation, stages)
+
+    def cache_summary(self):
+        stats = self.results.stats()
+        return (f"Кэш: {stats['entries']} результатов, {stats['bytes'] / (1024 * 1024):.1f} МБ, "
+                f"попаданий {stats['hit_rate']:.0%}")
+
+    def start_full_render(self, generation, stages):
+        self.render_job = None
+        size = self.panel_size(self.panel_res)
+        future = self.worker.submit(self.render_full, generation, self.img, self.digest, stages, size)
+        self.root.after(40, self.poll_render, generation, future, self.result_span(stages))
+
+    def result_span(self, stages):
+        # thresholds give 0 / max_value, filters keep the values of the source
+        if self.span is None or not any(stage.threshold for stage, _ in stages):
+            return self.span
+        return 0, max_value(self.img.dtype)
+
+    def render_full(self, generation, img, digest, stages, size):
+        if generation != self.generation:
+            return None
+        start = time.perf_counter()
+        self.full_pipeline.stages = stages
+        # copied out of the pipeline buffer, which the next render reuses
+        res = self.full_pipeline.run(img).copy()
+        self.results.put(digest, stages, res)
+        if generation != self.generation:
+            return None
+        return self.fit_image(res, *size), time.perf_counter() - start
+
+    def poll_render(self, generation, future, span):
+        if generation != self.generation:
+            future.cancel()
+            return
+        if not future.done():
+            self.root.after(40, self.poll_render, generation, future, span)
+            return
+        try:
+            result = future.result()
+        except Exception as e:
+            messagebox.showerror("Ошибка", f"Не удалось обработать изображение: {e}")
+            return
+        if result is None:
+            return
+        img, elapsed = result
+        self.show(img, self.panel_res, span)
+        self.status.set(f"Полное разрешение: {elapsed:.2f} с. {self.cache_summary()}")
 
-        res = self.img.copy()
-        m = self.method.get()
-
-        if m == "Медианный фильтр":
-            res = медианный_фильтр(res)
-        elif m == "Фильтр минимума":
-            res = фильтр_минимума(res)
-        elif m == "Фильтр максимума":
-            res = фильтр_максимума(res)
-        elif m == "Глобальная пороговая":
-            res = глобальная_пороговая(res)
-        elif m == "Пороговая по Отсу":
-            res = пороговая_отсу(res)
-        elif m == "Адаптивная пороговая":
-            res = адаптивная_пороговая(res)
-
-        self.show(res, self.panel_res)
-
-root = tk.Tk()
-Приложение(root)
-root.mainloop()
+if __name__ == "__main__":
+    root = tk.Tk()
+    Приложение(root)
+    root.mainloop()
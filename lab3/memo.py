@@ -0,0 +1,67 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def image_digest(img):
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{img.shape}|{img.dtype.str}".encode())
+    h.update(memoryview(img if img.flags.c_contiguous else img.copy()).cast("B"))
+    return h.hexdigest()
+
+
+def stages_key(stages):
+    return tuple((stage.name, tuple(sorted(params.items()))) for stage, params in stages)
+
+
+class ResultCache:
+    # LRU of filter results bounded by their total size in bytes, keyed by
+    # (image digest, stage names and parameters)
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.items = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, digest, stages):
+        key = (digest, stages_key(stages))
+        with self.lock:
+            img = self.items.get(key)
+            if img is None:
+                self.misses += 1
+                return None
+            self.items.move_to_end(key)
+            self.hits += 1
+            return img
+
+    def put(self, digest, stages, img):
+        if img.nbytes > self.max_bytes:
+            return
+        key = (digest, stages_key(stages))
+        with self.lock:
+            old = self.items.pop(key, None)
+            if old is not None:
+                self.bytes -= old.nbytes
+            self.items[key] = img
+            self.bytes += img.nbytes
+            while self.bytes > self.max_bytes:
+                _, evicted = self.items.popitem(last=False)
+                self.bytes -= evicted.nbytes
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+            self.bytes = 0
+
+    def stats(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self.items),
+                'bytes': self.bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,243 @@
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+from threshold_analysis import adaptive_mean_threshold, gray_histogram, level, max_value, otsu_value, value_range
+
+BGR = "bgr"
+GRAY = "gray"
+SAME = None
+
+CONVERSIONS = {
+    (BGR, GRAY): cv2.COLOR_BGR2GRAY,
+    (GRAY, BGR): cv2.COLOR_GRAY2BGR,
+}
+
+
+class Stage:
+    def __init__(self, name, title, func, needs=SAME, defaults=None, halo=None, whole_image=False,
+                 threshold=False):
+        self.name = name
+        self.title = title
+        self.func = func
+        self.needs = needs
+        self.defaults = defaults or {}
+        # pixels of context each output pixel depends on, and whether the stage needs
+        # statistics of the whole image (tiled execution relies on both)
+        self.halo = halo or (lambda params: 0)
+        self.whole_image = whole_image
+        # a threshold gives 0 / max_value and lays its levels over the value range of its
+        # input, which for float images is a whole-image statistic passed as `_range`
+        self.threshold = threshold
+
+    def output_space(self, space):
+        return self.needs or space
+
+
+STAGES = {}
+
+# label, minimum, maximum, step; odd sizes step by 2 from an odd minimum.
+# Thresholds and C are on the 8-bit scale for every image depth.
+PARAMS = {
+    'ksize': ("Размер окна", 3, 31, 2),
+    'size': ("Размер ядра", 1, 31, 1),
+    'thresh': ("Порог", 0, 255, 1),
+    'block': ("Размер блока", 3, 101, 2),
+    'c': ("Константа C", -50, 50, 1),
+}
+
+
+def register(name, title, needs=SAME, halo=None, whole_image=False, threshold=False, **defaults):
+    def decorator(func):
+        STAGES[name] = Stage(name, title, func, needs, defaults, halo, whole_image, threshold)
+        return func
+    return decorator
+
+
+def stage_by_title(title):
+    for stage in STAGES.values():
+        if stage.title == title:
+            return stage
+    raise KeyError(title)
+
+
+@register("median", "Медианный фильтр", halo=lambda p: p["ksize"] // 2, ksize=5)
+def median(src, dst, ksize):
+    if src.dtype != np.uint8 and ksize > 5:
+        raise ValueError("для 16-битных и float изображений медиана только 3x3 или 5x5")
+    return cv2.medianBlur(src, ksize, dst=dst)
+
+
+@register("min", "Фильтр минимума", halo=lambda p: p["size"] // 2, size=3)
+def minimum(src, dst, size):
+    return cv2.erode(src, np.ones((size, size), np.uint8), dst=dst)
+
+
+@register("max", "Фильтр максимума", halo=lambda p: p["size"] // 2, size=3)
+def maximum(src, dst, size):
+    return cv2.dilate(src, np.ones((size, size), np.uint8), dst=dst)
+
+
+@register("global", "Глобальная пороговая", needs=GRAY, threshold=True, thresh=127)
+def global_threshold(src, dst, thresh, _range=None):
+    span = _range or value_range(src)
+    return cv2.threshold(src, level(thresh, span), max_value(src.dtype), cv2.THRESH_BINARY, dst=dst)[1]
+
+
+@register("otsu", "Пороговая по Отсу", needs=GRAY, whole_image=True, threshold=True)
+def otsu_threshold(src, dst, _value=None, _range=None):
+    # `_value` is a threshold found beforehand, e.g. from a histogram gathered tile by tile
+    top = max_value(src.dtype)
+    if _value is None:
+        if src.dtype in (np.uint8, np.uint16):
+            return cv2.threshold(src, 0, top, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=dst)[1]
+        span = _range or value_range(src)
+        _value = otsu_value(gray_histogram(src, span), src.dtype, span)
+    return cv2.threshold(src, _value, top, cv2.THRESH_BINARY, dst=dst)[1]
+
+
+@register("adaptive", "Адаптивная пороговая", needs=GRAY, halo=lambda p: p["block"] // 2, threshold=True,
+          block=11, c=2)
+def adaptive_threshold(src, dst, block, c, _range=None):
+    if src.dtype != np.uint8:
+        return adaptive_mean_threshold(src, block, c, dst, _range)
+    return cv2.adaptiveThreshold(src, 255, cv2.ADAPTIVE_THRESH_MEAN_C, cv2.THRESH_BINARY, block, c, dst=dst)
+
+
+def check_params(stage, params):
+    for key, value in params.items():
+        if key.startswith("_"):
+            continue
+        if key not in stage.defaults:
+            raise ValueError(f"{stage.name}: неизвестный параметр {key}")
+        _, low, high, step = PARAMS[key]
+        if not low <= value <= high or (step == 2 and value % 2 == 0):
+            raise ValueError(f"{stage.name}: недопустимое значение {key}={value}")
+
+
+def describe_stage(stage, params):
+    if not params:
+        return stage.title
+    return f"{stage.title} ({', '.join(f'{key}={value}' for key, value in params.items())})"
+
+
+def read_image(path):
+    # keeps 16-bit and float depth and gray images as they are; alpha is dropped
+    return cv2.imread(path, cv2.IMREAD_ANYDEPTH | cv2.IMREAD_ANYCOLOR)
+
+
+def space_of(img):
+    return GRAY if img.ndim == 2 else BGR
+
+
+def parse_spec(spec):
+    # "median", ("median", {"ksize": 7}) or "median:ksize=7"
+    if isinstance(spec, str):
+        name, _, args = spec.partition(":")
+        params = {}
+        for item in filter(None, args.split(",")):
+            key, _, value = item.partition("=")
+            params[key.strip()] = float(value) if "." in value else int(value)
+        return name.strip(), params
+    name, params = spec
+    return name, dict(params)
+
+
+class Pipeline:
+    # Stages run back to back through two preallocated buffers per shape (OpenCV `dst=`),
+    # and the BGR<->GRAY conversions between them are planned once, so a threshold after
+    # a threshold does not convert back to BGR and forth again. Buffers are kept for the
+    # last `sizes` image sizes only, so a run of images in different sizes does not pile
+    # them up.
+    def __init__(self, stages=(), output=BGR, sizes=1):
+        self.stages = []
+        self.output = output
+        self.sizes = sizes
+        self.buffers = OrderedDict()
+        self.current = {}
+        for spec in stages:
+            self.add(*parse_spec(spec))
+
+    @classmethod
+    def from_string(cls, text, output=BGR):
+        return cls([item for item in text.split("|") if item.strip()], output)
+
+    def add(self, name, params=None):
+        stage = STAGES[name]
+        check_params(stage, params or {})
+        merged = dict(stage.defaults)
+        merged.update(params or {})
+        self.stages.append((stage, merged))
+        return self
+
+    def clear(self):
+        self.stages = []
+
+    def __len__(self):
+        return len(self.stages)
+
+    def describe(self):
+        return " → ".join(describe_stage(stage, params) for stage, params in self.stages)
+
+    def halo(self):
+        return sum(stage.halo(params) for stage, params in self.stages)
+
+    def output_space(self, space):
+        for stage, _ in self.stages:
+            space = stage.output_space(space)
+        return self.output or space
+
+    def plan(self, space):
+        steps = []
+        for stage, params in self.stages:
+            if stage.needs and stage.needs != space:
+                steps.append(("convert", CONVERSIONS[(space, stage.needs)]))
+                space = stage.needs
+            steps.append(("stage", stage, params))
+            space = stage.output_space(space)
+        if self.output and self.output != space:
+            steps.append(("convert", CONVERSIONS[(space, self.output)]))
+            space = self.output
+        return steps
+
+    def use_size(self, size):
+        self.current = self.buffers.pop(size, None) or {}
+        self.buffers[size] = self.current
+        while len(self.buffers) > self.sizes:
+            self.buffers.popitem(last=False)
+
+    def buffer(self, shape, dtype, avoid):
+        key = (shape, np.dtype(dtype).str)
+        pair = self.current.get(key)
+        if pair is None:
+            pair = self.current[key] = [np.empty(shape, dtype), np.empty(shape, dtype)]
+        return pair[1] if pair[0] is avoid else pair[0]
+
+    def release(self):
+        self.buffers.clear()
+        self.current = {}
+
+    def run(self, img, out=None):
+        # the result lives in an internal buffer until the next run; pass `out` to keep it
+        current = img
+        h, w = img.shape[:2]
+        self.use_size((h, w))
+        steps = self.plan(space_of(img))
+        for i, step in enumerate(steps):
+            last = i == len(steps) - 1
+            if step[0] == "convert":
+                code = step[1]
+                shape = (h, w) if code == cv2.COLOR_BGR2GRAY else (h, w, 3)
+                dst = out if last and out is not None else self.buffer(shape, current.dtype, current)
+                current = cv2.cvtColor(current, code, dst=dst)
+            else:
+                _, stage, params = step
+                dst = out if last and out is not None else self.buffer(current.shape, current.dtype, current)
+                current = stage.func(current, dst, **params)
+        if current is img:
+            if out is None:
+                return img.copy()
+            np.copyto(out, img)
+            return out
+        return current
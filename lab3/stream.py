@@ -0,0 +1,221 @@
+import argparse
+import os
+import queue
+import sys
+import threading
+import time
+
+import cv2
+
+from pipeline import Pipeline
+
+FOURCC = {'.avi': "MJPG", '.mp4': "mp4v", '.mkv': "XVID"}
+
+
+class Slot:
+    # a frame in flight: the buffer it is read into and the buffer its result is written
+    # to; both are reused once the writer has written the result
+    def __init__(self):
+        self.index = -1
+        self.frame = None
+        self.result = None
+
+
+class FrameStream:
+    # reader thread -> worker threads (one pipeline each) -> ordered writer thread;
+    # the number of slots bounds the frames in flight and so the memory used
+    def __init__(self, source, output, stages, workers=None, slots=None, fps=None,
+                 on_preview=None, preview_size=(480, 360), preview_interval=0.2):
+        self.source = source
+        self.output = output
+        pipeline = stages if isinstance(stages, Pipeline) else Pipeline.from_string(stages)
+        self.specs = [(stage.name, params) for stage, params in pipeline.stages]
+        self.workers = workers or os.cpu_count() or 1
+        self.free = queue.Queue()
+        for _ in range(slots or self.workers * 2):
+            self.free.put(Slot())
+        self.work = queue.Queue()
+        self.done = queue.Queue()
+        self.fps = fps
+        self.on_preview = on_preview
+        self.preview_size = preview_size
+        self.preview_interval = preview_interval
+        self.stopped = threading.Event()
+        self.error = None
+        self.frames_read = 0
+        self.frames_written = 0
+        self.started = None
+        self.finished = None
+
+    def stop(self):
+        self.stopped.set()
+
+    def fail(self, error):
+        if self.error is None:
+            self.error = error
+        self.stopped.set()
+
+    def stats(self):
+        end = self.finished or time.perf_counter()
+        elapsed = end - self.started if self.started else 0.0
+        return {
+            'frames': self.frames_written,
+            'seconds': elapsed,
+            'fps': self.frames_written / elapsed if elapsed > 0 else 0.0,
+        }
+
+    def read_frames(self, capture):
+        try:
+            while not self.stopped.is_set():
+                slot = self.free.get()
+                ok, frame = capture.read(slot.frame)
+                if not ok:
+                    self.free.put(slot)
+                    break
+                slot.frame = frame
+                slot.index = self.frames_read
+                self.frames_read += 1
+                self.work.put(slot)
+        except Exception as e:
+            self.fail(e)
+        finally:
+            for _ in range(self.workers):
+                self.work.put(None)
+
+    def process_frames(self):
+        pipeline = Pipeline(self.specs)
+        try:
+            while True:
+                slot = self.work.get()
+                if slot is None:
+                    break
+                if self.stopped.is_set():
+                    self.done.put(slot)
+                    continue
+                if slot.result is None or slot.result.shape[:2] != slot.frame.shape[:2]:
+                    slot.result = pipeline.run(slot.frame).copy()
+                else:
+                    pipeline.run(slot.frame, out=slot.result)
+                self.done.put(slot)
+        except Exception as e:
+            self.fail(e)
+        finally:
+            self.done.put(None)
+
+    def open_writer(self, frame, fps):
+        ext = os.path.splitext(self.output)[1].lower()
+        fourcc = cv2.VideoWriter_fourcc(*FOURCC.get(ext, "MJPG"))
+        writer = cv2.VideoWriter(self.output, fourcc, fps, (frame.shape[1], frame.shape[0]))
+        if not writer.isOpened():
+            raise ValueError(f"не удалось открыть {self.output} для записи")
+        return writer
+
+    def write_frames(self, fps):
+        pending = {}
+        next_index = 0
+        running = self.workers
+        writer = None
+        last_preview = 0.0
+        try:
+            while running:
+                slot = self.done.get()
+                if slot is None:
+                    running -= 1
+                    continue
+                pending[slot.index] = slot
+                # results leave in frame order, whichever worker finished first
+                while next_index in pending:
+                    slot = pending.pop(next_index)
+                    next_index += 1
+                    if not self.stopped.is_set():
+                        if "%" in self.output:
+                            cv2.imwrite(self.output % slot.index, slot.result)
+                        else:
+                            if writer is None:
+                                writer = self.open_writer(slot.result, fps)
+                            writer.write(slot.result)
+                        self.frames_written += 1
+                        now = time.perf_counter()
+                        if self.on_preview and now - last_preview >= self.preview_interval:
+                            last_preview = now
+                            self.on_preview(slot.index, self.preview(slot.result))
+                    self.free.put(slot)
+        except Exception as e:
+            self.fail(e)
+            # keep draining, so workers never block on a full pipeline
+            while running:
+                if self.done.get() is None:
+                    running -= 1
+        finally:
+            if writer is not None:
+                writer.release()
+
+    def preview(self, img):
+        h, w = img.shape[:2]
+        scale = min(self.preview_size[0] / w, self.preview_size[1] / h, 1.0)
+        return cv2.resize(img, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+    def run(self):
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            raise ValueError(f"не удалось открыть {self.source}")
+        fps = self.fps or capture.get(cv2.CAP_PROP_FPS) or 25.0
+        self.started = time.perf_counter()
+        threads = [threading.Thread(target=self.read_frames, args=(capture,), daemon=True)]
+        threads += [threading.Thread(target=self.process_frames, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        try:
+            self.write_frames(fps)
+        finally:
+            self.stopped.set()
+            # release a reader waiting for a slot
+            self.free.put(Slot())
+            for thread in threads:
+                thread.join()
+            capture.release()
+            self.finished = time.perf_counter()
+        if self.error is not None:
+            raise self.error
+        return self.stats()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a lab3 pipeline to a video or a numbered image sequence.")
+    parser.add_argument("input", help='video file or image sequence pattern, e.g. "frames/img_%%04d.png"')
+    parser.add_argument("output", help='video file (.avi, .mp4, .mkv) or image pattern, e.g. "out/img_%%04d.png"')
+    parser.add_argument("-p", "--pipeline", required=True, help='stages separated by "|", e.g. "median|otsu"')
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("--slots", type=int, default=None, help="frames in flight (default: 2 per worker)")
+    parser.add_argument("--fps", type=float, default=None, help="output frame rate (default: the input's)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        stream = FrameStream(args.input, args.output, args.pipeline, args.workers, args.slots, args.fps)
+    except (KeyError, ValueError) as e:
+        print(f"Неверная цепочка {args.pipeline!r}: {e}", file=sys.stderr)
+        return 2
+
+    def report():
+        while not stream.stopped.wait(1.0):
+            stats = stream.stats()
+            print(f"\rКадров: {stats['frames']}, {stats['fps']:.1f} к/с", end="", file=sys.stderr)
+
+    threading.Thread(target=report, daemon=True).start()
+    try:
+        stats = stream.run()
+    except KeyboardInterrupt:
+        stream.stop()
+        stats = stream.stats()
+    except (ValueError, cv2.error) as e:
+        print(f"\nОшибка: {e}", file=sys.stderr)
+        return 1
+    print(f"\rКадров: {stats['frames']} за {stats['seconds']:.2f} с, {stats['fps']:.1f} к/с", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,257 @@
+import math
+
+import cv2
+import numpy as np
+
+FLT_EPSILON = float(np.finfo(np.float32).eps)
+MAX_BLOCK = 101
+# float images are binned over their own value range at 16-bit resolution
+FLOAT_BINS = 65536
+
+
+def is_float(dtype):
+    return np.issubdtype(dtype, np.floating)
+
+
+def max_value(dtype):
+    if dtype == np.uint16:
+        return 65535
+    return 1.0 if is_float(dtype) else 255
+
+
+def finite_range(img):
+    # smallest and largest finite value, or None if there is none
+    lo, hi = float(np.min(img)), float(np.max(img))
+    if math.isfinite(lo) and math.isfinite(hi):
+        return lo, hi
+    finite = img[np.isfinite(img)]
+    return (float(finite.min()), float(finite.max())) if finite.size else None
+
+
+def spread_range(extent):
+    # a flat or empty image still needs a span to lay the thresholds over
+    if extent is None:
+        return 0.0, 1.0
+    lo, hi = extent
+    return (lo, hi) if hi > lo else (lo, lo + 1.0)
+
+
+def value_range(img):
+    # the values thresholds, C and histogram bins are laid over: the whole integer
+    # range, or the data's own range for float images, which are rarely 0..1
+    if not is_float(img.dtype):
+        return 0, max_value(img.dtype)
+    return spread_range(finite_range(img))
+
+
+def value_scale(span):
+    # thresholds and C are given on the 8-bit scale and stretched to the value range
+    lo, hi = span
+    return (hi - lo) / 255
+
+
+def level(thresh, span):
+    return span[0] + thresh * value_scale(span)
+
+
+def gray_histogram(gray, span=None):
+    if gray.dtype == np.uint8:
+        return np.bincount(gray.ravel(), minlength=256)
+    if gray.dtype == np.uint16:
+        return np.bincount(gray.ravel(), minlength=65536)
+    lo, hi = span or value_range(gray)
+    finite = np.isfinite(gray)
+    if not finite.all():
+        gray = gray[finite]
+    bins = np.rint((gray.astype(np.float64).ravel() - lo) * ((FLOAT_BINS - 1) / (hi - lo)))
+    return np.bincount(np.clip(bins, 0, FLOAT_BINS - 1).astype(np.int32), minlength=FLOAT_BINS)
+
+
+def otsu_value(hist, dtype, span=None):
+    # the 256- and 65536-bin cases give the same value as OpenCV's 8u and 16u Otsu;
+    # float bins cover `span` and have no OpenCV counterpart to match
+    if not is_float(dtype):
+        return otsu_from_histogram(hist)
+    lo, hi = span or (0.0, 1.0)
+    return lo + otsu_sweep(hist) * (hi - lo) / (FLOAT_BINS - 1)
+
+
+def adaptive_mean_threshold(src, block, c, dst=None, span=None):
+    # cv2.adaptiveThreshold is 8-bit only; this is its mean variant for 16-bit and float
+    # images, rounding the mean and ceiling C for integer types the way OpenCV does
+    span = span or value_range(src)
+    values = src
+    if is_float(src.dtype) and not np.isfinite(src).all():
+        # the box filter keeps running sums, so a NaN would spoil the rest of its row;
+        # missing values count as the bottom of the range and infinities as its ends
+        values = np.nan_to_num(src, nan=span[0], posinf=span[1], neginf=span[0])
+    mean = cv2.boxFilter(values, cv2.CV_64F, (block, block), normalize=True,
+                         borderType=cv2.BORDER_REPLICATE | cv2.BORDER_ISOLATED)
+    delta = c * value_scale(span)
+    if not is_float(src.dtype):
+        np.rint(mean, out=mean)
+        delta = math.ceil(delta)
+    mean -= delta
+    return binary(np.greater(src, mean), src.dtype, dst)
+
+
+def binary(mask, dtype, dst=None):
+    if dst is None:
+        dst = np.empty(mask.shape, dtype)
+    np.multiply(mask, max_value(dtype), out=dst, casting="unsafe")
+    return dst
+
+
+def otsu_from_histogram(hist):
+    # same arithmetic as OpenCV's getThreshVal_Otsu_8u, so a threshold found from a
+    # histogram (whole image or gathered tile by tile) equals the one cv2.threshold finds
+    # plain Python floats are the same doubles and far quicker to loop over than numpy scalars
+    hist = [int(count) for count in hist]
+    scale = 1.0 / sum(hist)
+    mu = 0.0
+    for i, count in enumerate(hist):
+        mu += i * float(count)
+    mu *= scale
+
+    mu1 = q1 = 0.0
+    max_sigma = 0.0
+    max_val = 0
+    for i, count in enumerate(hist):
+        p_i = count * scale
+        mu1 *= q1
+        q1 += p_i
+        q2 = 1.0 - q1
+        if min(q1, q2) < FLT_EPSILON or max(q1, q2) > 1.0 - FLT_EPSILON:
+            continue
+        mu1 = (mu1 + i * p_i) / q1
+        mu2 = (mu - q1 * mu1) / q2
+        sigma = q1 * q2 * (mu1 - mu2) * (mu1 - mu2)
+        if sigma > max_sigma:
+            max_sigma = sigma
+            max_val = i
+    return max_val
+
+
+def otsu_sweep(hist):
+    # the same criterion over all the bins at once, from cumulative sums; its rounding
+    # is not OpenCV's, so it serves the float bins, where a Python loop is too slow
+    p = np.asarray(hist, np.float64) / np.sum(hist)
+    q1 = np.cumsum(p)
+    m1 = np.cumsum(np.arange(len(p)) * p)
+    q2 = 1.0 - q1
+    valid = (np.minimum(q1, q2) >= FLT_EPSILON) & (np.maximum(q1, q2) <= 1.0 - FLT_EPSILON)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mu1 = m1 / q1
+        mu2 = (m1[-1] - m1) / q2
+        sigma = np.where(valid, q1 * q2 * (mu1 - mu2) ** 2, 0.0)
+    best = int(np.argmax(sigma))
+    return best if sigma[best] > 0 else 0
+
+
+class ThresholdAnalysis:
+    # The grayscale image, its histogram and an integral image of it (padded by edge
+    # replication for windows up to `max_block`) are computed once; the threshold family
+    # is then derived from them. Results equal cv2.threshold / cv2.adaptiveThreshold.
+    def __init__(self, img, max_block=MAX_BLOCK):
+        self.gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+        self.dtype = self.gray.dtype
+        self.top = max_value(self.dtype)
+        self.range = value_range(self.gray)
+        self.scale = value_scale(self.range)
+        self.hist = gray_histogram(self.gray, self.range)
+        self.pad = max_block // 2
+        self.max_block = max_block
+        self.integral = None
+        self.blurred = {}
+        self.gray16 = None
+        self._otsu = None
+
+    def ensure_integral(self):
+        if self.integral is None:
+            padded = cv2.copyMakeBorder(self.gray, *(self.pad,) * 4, cv2.BORDER_REPLICATE)
+            # float64 sums stay exact far beyond gigapixel images of 8- and 16-bit values
+            self.integral = cv2.integral(padded, sdepth=cv2.CV_64F)
+        return self.integral
+
+    def lut(self, thresh):
+        return np.where(np.arange(256) > math.floor(thresh), 255, 0).astype(np.uint8)
+
+    def threshold_native(self, value):
+        if self.dtype == np.uint8:
+            return cv2.LUT(self.gray, self.lut(value))
+        return cv2.threshold(self.gray, value, self.top, cv2.THRESH_BINARY)[1]
+
+    def global_threshold(self, thresh=127):
+        return self.threshold_native(level(thresh, self.range))
+
+    def foreground_share(self, thresholds):
+        # share of pixels above each threshold, straight from the cumulative histogram
+        above = self.hist[::-1].cumsum()[::-1]
+        total = above[0]
+        bins = len(self.hist)
+        shares = []
+        for t in thresholds:
+            limit = math.floor(t * (bins - 1) / 255 if is_float(self.dtype) else t * self.scale)
+            if limit < 0:
+                shares.append(1.0)
+            else:
+                shares.append(float(above[limit + 1]) / total if limit < bins - 1 else 0.0)
+        return shares
+
+    def otsu_value(self):
+        if self._otsu is None:
+            self._otsu = otsu_value(self.hist, self.dtype, self.range)
+        return self._otsu
+
+    def otsu(self):
+        return self.threshold_native(self.otsu_value())
+
+    def otsu_label(self):
+        # the Otsu value on the 8-bit scale the other thresholds are given in
+        return f"{(self.otsu_value() - self.range[0]) / self.scale:g}"
+
+    def box_mean(self, block):
+        if block % 2 == 0 or not 3 <= block <= self.max_block:
+            raise ValueError(f"размер блока должен быть нечётным от 3 до {self.max_block}")
+        integral = self.ensure_integral()
+        h, w = self.gray.shape
+        r = block // 2
+        y0, x0 = self.pad - r, self.pad - r
+        y1, x1 = self.pad + r + 1, self.pad + r + 1
+        s = integral[y1:y1 + h, x1:x1 + w] - integral[y0:y0 + h, x1:x1 + w]
+        s -= integral[y1:y1 + h, x0:x0 + w]
+        s += integral[y0:y0 + h, x0:x0 + w]
+        s *= 1.0 / (block * block)
+        if is_float(self.dtype):
+            return s
+        # an odd window has no .5 ties, so rint rounds like OpenCV's box filter
+        np.rint(s, out=s)
+        return s.astype(np.int16) if self.dtype == np.uint8 else s
+
+    def gaussian_mean(self, block):
+        mean = self.blurred.get(block)
+        if mean is None:
+            # blurred in float32 and rounded, as cv2.adaptiveThreshold computes its Gaussian mean
+            blurred = cv2.GaussianBlur(self.gray.astype(np.float32), (block, block), 0,
+                                       borderType=cv2.BORDER_REPLICATE | cv2.BORDER_ISOLATED)
+            if is_float(self.dtype):
+                mean = blurred
+            else:
+                mean = np.rint(blurred).astype(np.int16 if self.dtype == np.uint8 else np.float64)
+            self.blurred[block] = mean
+        return mean
+
+    def adaptive(self, mean, c):
+        if self.dtype != np.uint8:
+            delta = c * self.scale
+            return binary(self.gray > mean - (delta if is_float(self.dtype) else math.ceil(delta)), self.dtype)
+        if self.gray16 is None:
+            self.gray16 = self.gray.astype(np.int16)
+        # cv2.adaptiveThreshold with THRESH_BINARY keeps pixels above mean - ceil(C)
+        return binary(self.gray16 > mean - math.ceil(c), self.dtype)
+
+    def adaptive_mean(self, block=11, c=2):
+        return self.adaptive(self.box_mean(block), c)
+
+    def adaptive_gaussian(self, block=11, c=2):
+        return self.adaptive(self.gaussian_mean(block), c)
@@ -0,0 +1,205 @@
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from pipeline import BGR, GRAY, Pipeline, read_image, space_of
+from threshold_analysis import finite_range, gray_histogram, is_float, otsu_value, spread_range
+
+
+def tiles(height, width, tile):
+    for y in range(0, height, tile):
+        for x in range(0, width, tile):
+            yield y, min(y + tile, height), x, min(x + tile, width)
+
+
+def needs_statistics(stage, dtype):
+    # Otsu needs the histogram of its whole input, and on float images every threshold
+    # needs the value range of its whole input
+    return stage.whole_image or (stage.threshold and is_float(dtype))
+
+
+def split_segments(stages, dtype):
+    # such a stage starts a new segment: its statistics are gathered from the segment
+    # input before the segment runs and passed in as `_range` and `_value`
+    segments = []
+    for stage, params in stages:
+        if needs_statistics(stage, dtype) or not segments:
+            segments.append([])
+        segments[-1].append((stage, params))
+    return segments
+
+
+def allocate(shape, dtype, folder):
+    if folder is None:
+        return np.empty(shape, dtype)
+    fd, path = tempfile.mkstemp(suffix=".npy", dir=folder)
+    os.close(fd)
+    return np.lib.format.open_memmap(path, "w+", dtype, shape)
+
+
+class TiledRunner:
+    def __init__(self, pipeline, tile=1024, workers=None):
+        self.pipeline = pipeline
+        self.tile = tile
+        self.workers = workers or os.cpu_count() or 1
+        self.local = threading.local()
+
+    def gray_tiles(self, src, pool, func):
+        def gray(box):
+            y0, y1, x0, x1 = box
+            part = src[y0:y1, x0:x1]
+            if part.ndim == 3:
+                part = cv2.cvtColor(np.ascontiguousarray(part), cv2.COLOR_BGR2GRAY)
+            return func(part)
+        return pool.map(gray, tiles(src.shape[0], src.shape[1], self.tile))
+
+    def histogram(self, src, pool, span=None):
+        return sum(self.gray_tiles(src, pool, lambda part: gray_histogram(part, span)))
+
+    def value_range(self, src, pool):
+        # the same value as threshold_analysis.value_range of the whole gray image
+        extents = [e for e in self.gray_tiles(src, pool, finite_range) if e is not None]
+        if not extents:
+            return spread_range(None)
+        return spread_range((min(e[0] for e in extents), max(e[1] for e in extents)))
+
+    def statistics(self, stage, src, pool):
+        params = {}
+        if is_float(src.dtype):
+            params['_range'] = self.value_range(src, pool)
+        if stage.whole_image:
+            span = params.get('_range')
+            params['_value'] = otsu_value(self.histogram(src, pool, span), src.dtype, span)
+        return params
+
+    def region(self, src, box):
+        # copy the tile with its halo into a per-thread buffer reused for same-sized tiles
+        y0, y1, x0, x1 = box
+        shape = (y1 - y0, x1 - x0) + src.shape[2:]
+        buffers = getattr(self.local, "buffers", None)
+        if buffers is None:
+            buffers = self.local.buffers = {}
+        buf = buffers.get(shape)
+        if buf is None:
+            buf = buffers[shape] = np.empty(shape, src.dtype)
+        np.copyto(buf, src[y0:y1, x0:x1])
+        return buf
+
+    def run_segment(self, src, dst, stages, output, pool):
+        specs = [(stage.name, params) for stage, params in stages]
+        halo = Pipeline(specs).halo()
+        height, width = src.shape[:2]
+        self.local = threading.local()
+
+        def work(box):
+            # each thread keeps its own pipeline, and with it its own stage buffers for the
+            # few tile sizes of a grid (inside, edges, corners)
+            pipeline = getattr(self.local, "pipeline", None)
+            if pipeline is None:
+                pipeline = self.local.pipeline = Pipeline(specs, output, sizes=9)
+            y0, y1, x0, x1 = box
+            ry0, ry1 = max(0, y0 - halo), min(height, y1 + halo)
+            rx0, rx1 = max(0, x0 - halo), min(width, x1 + halo)
+            res = pipeline.run(self.region(src, (ry0, ry1, rx0, rx1)))
+            dst[y0:y1, x0:x1] = res[y0 - ry0:y1 - ry0, x0 - rx0:x1 - rx0]
+
+        for _ in pool.map(work, tiles(height, width, self.tile)):
+            pass
+
+    def run(self, src, dst=None, spill_dir=None):
+        stages = self.pipeline.stages
+        height, width = src.shape[:2]
+        out_space = self.pipeline.output_space(space_of(src))
+        out_shape = (height, width, 3) if out_space == BGR else (height, width)
+        if dst is None:
+            dst = np.empty(out_shape, src.dtype)
+
+        segments = split_segments(stages, src.dtype) or [[]]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            current = src
+            space = space_of(src)
+            for i, segment in enumerate(segments):
+                if segment and needs_statistics(segment[0][0], current.dtype):
+                    stage, params = segment[0]
+                    segment = [(stage, dict(params, **self.statistics(stage, current, pool)))] + segment[1:]
+                last = i == len(segments) - 1
+                if last:
+                    target = dst
+                    output = self.pipeline.output
+                else:
+                    output = None
+                    for stage, _ in segment:
+                        space = stage.output_space(space)
+                    shape = (height, width) if space == GRAY else (height, width, 3)
+                    target = allocate(shape, src.dtype, spill_dir)
+                self.run_segment(current, target, segment, output, pool)
+                current = target
+        return dst
+
+
+def run_tiled(src, spec, dst=None, tile=1024, workers=None, spill_dir=None):
+    pipeline = spec if isinstance(spec, Pipeline) else Pipeline.from_string(spec)
+    return TiledRunner(pipeline, tile, workers).run(src, dst, spill_dir)
+
+
+def open_input(path):
+    # .npy files are memory-mapped, so only the tiles in flight are paged in
+    if path.lower().endswith(".npy"):
+        return np.load(path, mmap_mode="r")
+    img = read_image(path)
+    if img is None:
+        raise ValueError(f"не удалось прочитать {path}")
+    return img
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a lab3 pipeline to a large image tile by tile.")
+    parser.add_argument("input", help="source image; .npy files are memory-mapped")
+    parser.add_argument("output", help="result image; a .npy output is written through a memory map")
+    parser.add_argument("-p", "--pipeline", required=True, help='stages separated by "|", e.g. "median|otsu|max"')
+    parser.add_argument("-t", "--tile", type=int, default=1024, help="tile side in pixels")
+    parser.add_argument("-w", "--workers", type=int, default=None)
+    parser.add_argument("--verify", action="store_true", help="compare with the full-frame pipeline")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    pipeline = Pipeline.from_string(args.pipeline)
+    src = open_input(args.input)
+    height, width = src.shape[:2]
+    out_shape = (height, width, 3) if pipeline.output_space(space_of(src)) == BGR else (height, width)
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(args.output))) as spill_dir:
+        if args.output.lower().endswith(".npy"):
+            dst = np.lib.format.open_memmap(args.output, "w+", src.dtype, out_shape)
+            TiledRunner(pipeline, args.tile, args.workers).run(src, dst, spill_dir)
+            dst.flush()
+        else:
+            spill = spill_dir if isinstance(src, np.memmap) else None
+            dst = TiledRunner(pipeline, args.tile, args.workers).run(src, None, spill)
+            if not cv2.imwrite(args.output, dst):
+                print(f"Не удалось записать {args.output}", file=sys.stderr)
+                return 1
+    elapsed = time.perf_counter() - start
+    print(f"{width}x{height}: {elapsed:.2f} с, {width * height / elapsed / 1e6 if elapsed else 0:.1f} Мп/с",
+          file=sys.stderr)
+
+    if args.verify:
+        expected = pipeline.run(np.asarray(src))
+        same = np.array_equal(expected, dst)
+        print("Совпадает с обработкой целиком" if same else "Отличается от обработки целиком", file=sys.stderr)
+        return 0 if same else 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
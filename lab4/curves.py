@@ -0,0 +1,75 @@
+import numpy as np
+
+from raster_engine import bres_lines, spread
+
+# Bézier curves of any degree as connected pixel paths. Each curve is evaluated at
+# a few uniform parameter steps, as many as its flatness needs to keep the chords
+# within `tolerance` cells of it, and the rounded points are joined with Bresenham
+# lines, so the path has no gaps and no consecutive repeated pixels.
+
+TOLERANCE = 0.25
+
+
+def casteljau_at(ctrl, t):
+    # de Casteljau for all the parameters at once: ctrl is (points, degree + 1, 2),
+    # one control polygon per t, and the arithmetic is that of RasterApp.casteljau
+    t = t[:, None, None]
+    p = ctrl
+    while p.shape[1] > 1:
+        p = (1 - t) * p[:, :-1] + t * p[:, 1:]
+    return p[:, 0]
+
+
+def casteljau_points(ctrl, steps=300):
+    # the fixed-step evaluation of RasterApp.casteljau, point for point
+    ctrl = np.asarray(ctrl, np.float64)
+    t = np.arange(steps + 1) / steps
+    p = np.rint(casteljau_at(np.broadcast_to(ctrl, (len(t),) + ctrl.shape), t)).astype(np.int64)
+    return p[:, 0], p[:, 1]
+
+
+def segment_counts(ctrl, tolerance=TOLERANCE):
+    # a chord over a parameter step h is within h² / 8 * max|B''| of the curve, and
+    # |B''| <= n (n - 1) max|Δ²P| for degree n; no more steps than the control
+    # polygon is long, as shorter chords only repeat pixels
+    n = ctrl.shape[1] - 1
+    length = np.hypot(*np.diff(ctrl, axis=1).transpose(2, 0, 1)).sum(axis=1)
+    if n < 2:
+        return np.ones(len(ctrl), np.int64)
+    bend = np.hypot(*(ctrl[:, 2:] - 2 * ctrl[:, 1:-1] + ctrl[:, :-2]).transpose(2, 0, 1)).max(axis=1)
+    counts = np.ceil(np.sqrt(n * (n - 1) * bend / (8 * tolerance)))
+    return np.clip(counts, 1, np.maximum(np.ceil(length), 1)).astype(np.int64)
+
+
+def dedupe(x, y, starts):
+    # drop pixels equal to the one before them in the same curve
+    seg = np.repeat(np.arange(len(starts) - 1), np.diff(starts))
+    keep = np.ones(len(x), bool)
+    keep[1:] = (x[1:] != x[:-1]) | (y[1:] != y[:-1]) | (seg[1:] != seg[:-1])
+    counts = np.bincount(seg[keep], minlength=len(starts) - 1)
+    starts = np.zeros(len(starts), np.int64)
+    np.cumsum(counts, out=starts[1:])
+    return x[keep], y[keep], starts
+
+
+def bezier_curves(ctrl, tolerance=TOLERANCE, window=None):
+    # ctrl is (curves, degree + 1, 2); returns the paths concatenated with their starts
+    ctrl = np.asarray(ctrl, np.float64)
+    counts = segment_counts(ctrl, tolerance)
+    _, curve, i = spread(counts + 1)
+    t = i / counts[curve]
+    p = np.rint(casteljau_at(ctrl[curve], t)).astype(np.int64)
+    # chord j of a curve joins vertex j and j + 1; vertices are numbered across curves
+    last = np.zeros(len(p), bool)
+    last[np.cumsum(counts + 1) - 1] = True
+    a = np.flatnonzero(~last)
+    x, y, chord_starts = bres_lines(p[a, 0], p[a, 1], p[a + 1, 0], p[a + 1, 1], window)
+    starts = np.zeros(len(ctrl) + 1, np.int64)
+    np.cumsum(counts, out=starts[1:])
+    return dedupe(x, y, chord_starts[starts])
+
+
+def bezier(ctrl, tolerance=TOLERANCE, window=None):
+    ctrl = np.asarray(ctrl, np.float64)
+    return bezier_curves(ctrl[None], tolerance, window)[:2]
+
@@ -1,14 +1,21 @@
+import os
 import tkinter as tk
-from tkinter import ttk
+from tkinter import filedialog, messagebox, ttk
 from PIL import Image, ImageTk
 import cv2
-import numpy as np
 import time
 
+import curves
+import layers
+import raster_engine
+import render
+import scene
+
 IMG_W, IMG_H = 900, 700
 BASE_SCALE = 20
 MIN_SCALE = 0.01
 MAX_SCALE = 100.0
+WHEEL_ZOOM = 1.15
 
 class RasterApp(tk.Tk):
     def __init__(self):
@@ -18,10 +25,21 @@ class RasterApp(tk.Tk):
 
         self.scale = 1.0
         self.algorithm = tk.StringVar(value="dda")
+        self.vectorized = tk.BooleanVar(value=True)
+        self.workers = tk.IntVar(value=1)
+        self.pan = [0, 0]
+        self.shape = None
+        self.points = None
+        self.points_view = None
+        self.view = layers.LayeredView(IMG_W, IMG_H)
+        self.photo = None
+        self.pending = None
+        self.drag = None
 
         self.create_ui()
         self.algorithm.trace_add("write", self.update_fields)
         self.update_fields()
+        self.redraw()
 
     def create_ui(self):
         left = ttk.Frame(self)
@@ -41,6 +59,9 @@ class RasterApp(tk.Tk):
         for t, v in algorithms:
             ttk.Radiobutton(left, text=t, variable=self.algorithm, value=v).pack(anchor=tk.W)
 
+        # the scalar methods below stay as the reference for raster_engine
+        ttk.Checkbutton(left, text="NumPy", variable=self.vectorized).pack(anchor=tk.W, pady=5)
+
         self.entries = {}
         defaults = {"x0": "-5", "y0": "-5", "x1": "10", "y1": "8", "xc": "0", "yc": "0", "r": "10"}
         
@@ -61,8 +82,29 @@ class RasterApp(tk.Tk):
         self.scale_label = ttk.Label(left, text=f"Масштаб: {self.scale:.2f}x")
         self.scale_label.pack(pady=5)
 
+        # many primitives at once, always drawn by the NumPy engine
+        side = ttk.Frame(self)
+        side.pack(side=tk.LEFT, fill=tk.Y, padx=10, pady=10)
+        ttk.Label(side, text="Сцена").pack(anchor=tk.W)
+        ttk.Label(side, text="Примитивов каждого вида").pack(anchor=tk.W)
+        self.scene_count = ttk.Entry(side)
+        self.scene_count.insert(0, "1000")
+        self.scene_count.pack(fill=tk.X)
+        ttk.Button(side, text="Случайная", command=self.random_scene).pack(fill=tk.X, pady=5)
+        ttk.Button(side, text="Загрузить...", command=self.load_scene).pack(fill=tk.X)
+        ttk.Label(side, text="Потоки").pack(anchor=tk.W, pady=(5, 0))
+        ttk.Spinbox(side, from_=1, to=os.cpu_count() or 1, textvariable=self.workers, width=5).pack(anchor=tk.W)
+        self.scene_label = ttk.Label(side, text="", justify=tk.LEFT)
+        self.scene_label.pack(anchor=tk.W, pady=5)
+
         self.image_label = ttk.Label(self)
         self.image_label.pack(side=tk.RIGHT, expand=True)
+        self.image_label.bind("<MouseWheel>", self.on_wheel)
+        self.image_label.bind("<Button-4>", self.on_wheel)
+        self.image_label.bind("<Button-5>", self.on_wheel)
+        self.image_label.bind("<ButtonPress-1>", self.on_press)
+        self.image_label.bind("<B1-Motion>", self.on_drag)
+        self.image_label.bind("<ButtonRelease-1>", self.on_release)
 
     def update_fields(self, *_):
         required = {
@@ -81,8 +123,11 @@ class RasterApp(tk.Tk):
             else:
                 entry.configure(state="disabled")
 
+    def origin(self):
+        return IMG_W // 2 + self.pan[0], IMG_H // 2 + self.pan[1]
+
     def to_screen(self, x, y):
-        ox, oy = IMG_W // 2, IMG_H // 2
+        ox, oy = self.origin()
         step = int(BASE_SCALE * self.scale)
         return int(ox + x * step), int(oy - y * step)
 
@@ -93,20 +138,36 @@ class RasterApp(tk.Tk):
             if s < 1: s = 1 
             cv2.rectangle(img, (cx - s, cy - s), (cx + s, cy + s), (0, 0, 0), -1)
 
-    def draw_grid(self, img):
-        step_px = int(BASE_SCALE * self.scale)
-        if step_px <= 0: step_px = 1
-        
-        ox, oy = IMG_W // 2, IMG_H // 2
+    def draw_cells(self, img, x, y, alpha=None):
+        # the same cells as draw_pixel, all at once; Wu points are shaded by coverage
+        step = int(BASE_SCALE * self.scale)
+        s = max(1, int(BASE_SCALE * self.scale // 2))
+        return render.draw_cells(img, x, y, self.origin(), step, s, alpha)
 
-        start_x = (0 - ox) % step_px
-        start_y = (0 - oy) % step_px
-        
+    def view_key(self):
+        return int(BASE_SCALE * self.scale), self.origin()
+
+    def window(self):
+        step = int(BASE_SCALE * self.scale)
+        s = max(1, int(BASE_SCALE * self.scale // 2))
+        return render.window(self.origin(), step, s, IMG_W, IMG_H)
+
+    def grid_step(self):
+        return max(1, int(BASE_SCALE * self.scale))
+
+    def draw_grid_lines(self, img, step_px):
+        # lines through every multiple of the step from the corner, for LayeredView to
+        # slice at the origin's offset
+        h, w = img.shape[:2]
         if step_px > 2:
-            for x in range(start_x, IMG_W, step_px):
-                cv2.line(img, (x, 0), (x, IMG_H), (220, 220, 220), 1)
-            for y in range(start_y, IMG_H, step_px):
-                cv2.line(img, (0, y), (IMG_W, y), (220, 220, 220), 1)
+            for x in range(0, w, step_px):
+                cv2.line(img, (x, 0), (x, h), (220, 220, 220), 1)
+            for y in range(0, h, step_px):
+                cv2.line(img, (0, y), (w, y), (220, 220, 220), 1)
+
+    def draw_grid_marks(self, img):
+        step_px = self.grid_step()
+        ox, oy = self.origin()
 
         cv2.line(img, (ox, 0), (ox, IMG_H), (0, 0, 0), 2)
         cv2.line(img, (0, oy), (IMG_W, oy), (0, 0, 0), 2)
@@ -115,8 +176,9 @@ class RasterApp(tk.Tk):
         cv2.putText(img, "X", (IMG_W - 20, oy - 5), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
         cv2.putText(img, "Y", (ox + 5, 20), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 0), 2)
 
-        max_logical_x = (IMG_W // 2) // step_px + 1
-        max_logical_y = (IMG_H // 2) // step_px + 1
+        # labels for the logical range in view
+        min_x, max_x = -(ox // step_px) - 1, (IMG_W - ox) // step_px + 1
+        min_y, max_y = -((IMG_H - oy) // step_px) - 1, oy // step_px + 1
         
         text_step = 1
         if step_px < 5: text_step = 50
@@ -125,13 +187,13 @@ class RasterApp(tk.Tk):
         elif step_px < 40: text_step = 5
         elif step_px < 60: text_step = 2
 
-        for i in range(-int(max_logical_x), int(max_logical_x) + 1):
+        for i in range(min_x, max_x + 1):
             if i == 0 or i % text_step != 0: continue
             
             sx, sy = self.to_screen(i, 0)
             cv2.putText(img, str(i), (sx - 5, oy + 15), cv2.FONT_HERSHEY_SIMPLEX, 0.4, (0, 0, 0), 1)
 
-        for i in range(-int(max_logical_y), int(max_logical_y) + 1):
+        for i in range(min_y, max_y + 1):
             if i == 0 or i % text_step != 0: continue
             
             sx, sy = self.to_screen(0, i)
@@ -225,62 +287,171 @@ class RasterApp(tk.Tk):
         return pts
 
     def draw(self):
-        img = np.ones((IMG_H, IMG_W, 3), np.uint8) * 255
-        self.draw_grid(img)
-
         try:
-            start = time.perf_counter()
             a = self.algorithm.get()
 
             if a == "bres_circle":
-                pts = self.bres_circle(int(self.entries["xc"].get()),
-                                       int(self.entries["yc"].get()),
-                                       int(self.entries["r"].get()))
+                args = (int(self.entries["xc"].get()),
+                        int(self.entries["yc"].get()),
+                        int(self.entries["r"].get()))
             elif a == "casteljau":
-                pts = self.casteljau([
+                args = ([
                     (int(self.entries["x0"].get()), int(self.entries["y0"].get())),
                     (int(self.entries["xc"].get()), int(self.entries["yc"].get())),
                     (int(self.entries["x1"].get()), int(self.entries["y1"].get()))
-                ])
+                ],)
             elif a == "wu":
-                pts = self.wu(float(self.entries["x0"].get()),
-                              float(self.entries["y0"].get()),
-                              float(self.entries["x1"].get()),
-                              float(self.entries["y1"].get()))
+                args = (float(self.entries["x0"].get()),
+                        float(self.entries["y0"].get()),
+                        float(self.entries["x1"].get()),
+                        float(self.entries["y1"].get()))
             else:
-                x0 = int(self.entries["x0"].get())
-                y0 = int(self.entries["y0"].get())
-                x1 = int(self.entries["x1"].get())
-                y1 = int(self.entries["y1"].get())
-                pts = getattr(self, a)(x0, y0, x1, y1)
-
-            elapsed = (time.perf_counter() - start) * 1000
-            self.time_label.config(text=f"Время вычислений: {elapsed:.3f} мс")
-
-            for p in pts:
-                self.draw_pixel(img, p[0], p[1])
+                args = (int(self.entries["x0"].get()),
+                        int(self.entries["y0"].get()),
+                        int(self.entries["x1"].get()),
+                        int(self.entries["y1"].get()))
 
-            rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            im = ImageTk.PhotoImage(Image.fromarray(rgb))
-            self.image_label.configure(image=im)
-            self.image_label.image = im
+            self.shape = (a, args)
+            self.rasterize()
+            self.redraw()
 
         except ValueError:
             print("Ошибка ввода данных")
         except Exception as e:
             print(f"Ошибка: {e}")
 
+    def show_scene(self, sc):
+        self.shape = ("scene", (sc,))
+        self.rasterize()
+        self.redraw()
+
+    def random_scene(self):
+        try:
+            count = int(self.scene_count.get())
+        except ValueError:
+            print("Ошибка ввода данных")
+            return
+        self.show_scene(scene.random_scene(count))
+
+    def load_scene(self):
+        path = filedialog.askopenfilename(title="Сцена", filetypes=[("Сцена", "*.txt"), ("Все файлы", "*")])
+        if not path:
+            return
+        try:
+            sc = scene.load_scene(path)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Сцена", str(e))
+            return
+        self.show_scene(sc)
+
+    def worker_count(self):
+        try:
+            return max(1, self.workers.get())
+        except tk.TclError:
+            return 1
+
+    def rasterize(self):
+        # the NumPy engine only makes the points in view, so its points are made
+        # again for every new view; the scalar methods make them all, once
+        a, args = self.shape
+        start = time.perf_counter()
+        if a == "scene":
+            # points grouped per algorithm, each group a list of batches
+            pts, stats, _ = scene.rasterize(*args, window=self.window(), workers=self.worker_count())
+        elif not self.vectorized.get():
+            pts = getattr(self, a)(*args)
+        elif a == "casteljau":
+            # adaptive steps and a connected path, not the 300 fixed steps of casteljau()
+            pts = curves.bezier(*args, window=self.window())
+        else:
+            pts = raster_engine.ALGORITHMS[a](*args, window=self.window())
+        elapsed = (time.perf_counter() - start) * 1000
+        self.time_label.config(text=f"Время вычислений: {elapsed:.3f} мс")
+        self.scene_label.config(text=scene.report(stats, elapsed / 1000) if a == "scene" else "")
+        self.points = pts
+        self.points_view = self.view_key()
+
+    def draw_points(self, img):
+        # lists come from the scalar methods and are drawn cell by cell, arrays in one
+        # go; returns the box of the cells, for the shape layer
+        if self.points is None:
+            return None
+        if isinstance(self.points, list):
+            for p in self.points:
+                self.draw_pixel(img, p[0], p[1])
+            step = int(BASE_SCALE * self.scale)
+            s = max(1, int(BASE_SCALE * self.scale // 2))
+            return render.cells_box([p[0] for p in self.points], [p[1] for p in self.points],
+                                    self.origin(), step, s, IMG_W, IMG_H)
+        if isinstance(self.points, dict):
+            box = None
+            for batches in self.points.values():
+                for pts in batches:
+                    box = layers.union(box, self.draw_cells(img, *pts))
+            return box
+        return self.draw_cells(img, *self.points)
+
+    def redraw(self):
+        # the grid lines come from the cache and the cells from the stored points;
+        # only points cut to an earlier view are made again. The PhotoImage is pasted
+        # into in place
+        self.pending = None
+        key = self.view_key()
+        if self.shape is not None and not isinstance(self.points, list) and self.points_view != key:
+            self.rasterize()
+        self.view.show_grid(self.grid_step(), self.origin(), self.draw_grid_lines, self.draw_grid_marks)
+        self.view.paint(self.draw_points)
+        if self.view.compose() is None and self.photo is not None:
+            return
+        im = Image.fromarray(self.view.frame)
+        if self.photo is None:
+            self.photo = ImageTk.PhotoImage(im)
+            self.image_label.configure(image=self.photo)
+        else:
+            self.photo.paste(im)
+
+    def schedule_redraw(self):
+        # wheel and drag events come faster than frames; draw once they are handled
+        if self.pending is None:
+            self.pending = self.after_idle(self.redraw)
+
+    def zoom(self, scale, at=None):
+        if not MIN_SCALE <= scale <= MAX_SCALE:
+            return
+        if at is not None:
+            # keep the logical point under the cursor in place
+            ox, oy = self.origin()
+            step = max(1, int(BASE_SCALE * self.scale))
+            x, y = (at[0] - ox) / step, (oy - at[1]) / step
+            step = max(1, int(BASE_SCALE * scale))
+            self.pan = [round(at[0] - x * step) - IMG_W // 2, round(at[1] + y * step) - IMG_H // 2]
+        self.scale = scale
+        self.scale_label.config(text=f"Масштаб: {self.scale:.2f}x")
+        self.schedule_redraw()
+
     def zoom_in(self):
-        if self.scale * 1.5 <= MAX_SCALE:
-            self.scale *= 1.5
-            self.scale_label.config(text=f"Масштаб: {self.scale:.2f}x")
-            self.draw()
+        self.zoom(self.scale * 1.5)
 
     def zoom_out(self):
-        if self.scale / 1.5 >= MIN_SCALE:
-            self.scale /= 1.5
-            self.scale_label.config(text=f"Масштаб: {self.scale:.2f}x")
-            self.draw()
+        self.zoom(self.scale / 1.5)
+
+    def on_wheel(self, event):
+        up = event.num == 4 or event.delta > 0
+        self.zoom(self.scale * WHEEL_ZOOM if up else self.scale / WHEEL_ZOOM, (event.x, event.y))
+
+    def on_press(self, event):
+        self.drag = (event.x, event.y)
+
+    def on_drag(self, event):
+        if self.drag is None:
+            return
+        self.pan[0] += event.x - self.drag[0]
+        self.pan[1] += event.y - self.drag[1]
+        self.drag = (event.x, event.y)
+        self.schedule_redraw()
+
+    def on_release(self, event):
+        self.drag = None
 
 if __name__ == "__main__":
     RasterApp().mainloop()
\ No newline at end of file
@@ -0,0 +1,82 @@
+from collections import OrderedDict
+
+import numpy as np
+
+# What RasterApp shows is min(grid, shape). The grid lines repeat with the cell
+# step, so one pattern a period larger than the view is cached per step and the
+# view is a slice of it at the origin's offset; the axes and labels, which move
+# with the origin, are drawn over that slice. The shape layer holds the cells on
+# white, and after a change only the boxes that the old and new cells cover are
+# composited again. Cells and grid are dark on white, so the minimum gives the
+# same pixels as drawing the cells straight onto the grid. Everything is drawn in
+# grey, so the frame is shown in the layers' channel order.
+
+
+def union(a, b):
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), max(a[1], b[1]), min(a[2], b[2]), max(a[3], b[3])
+
+
+def intersect(a, b):
+    if a is None or b is None:
+        return None
+    box = max(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), min(a[3], b[3])
+    return box if box[0] < box[1] and box[2] < box[3] else None
+
+
+class LayeredView:
+    def __init__(self, width, height, budget=64 << 20):
+        self.width = width
+        self.height = height
+        # bytes of grid patterns kept; the current one is always kept
+        self.budget = budget
+        self.patterns = OrderedDict()
+        self.key = None
+        self.grid = np.full((height, width, 3), 255, np.uint8)
+        self.shape = np.full((height, width, 3), 255, np.uint8)
+        self.shape_box = None
+        self.frame = np.empty((height, width, 3), np.uint8)
+        self.dirty = None
+
+    def show_grid(self, step, origin, lines, marks):
+        # lines(img, step) paints the lines through every multiple of step on a white
+        # image, once per step; marks(img) adds what depends on the origin
+        if (step, origin) == self.key:
+            return
+        pattern = self.patterns.pop(step, None)
+        if pattern is None:
+            pattern = np.full((self.height + step, self.width + step, 3), 255, np.uint8)
+            lines(pattern, step)
+        self.patterns[step] = pattern
+        while len(self.patterns) > 1 and sum(p.nbytes for p in self.patterns.values()) > self.budget:
+            self.patterns.popitem(last=False)
+        dx, dy = origin[0] % step, origin[1] % step
+        self.grid[:] = pattern[dy:dy + self.height, dx:dx + self.width]
+        marks(self.grid)
+        self.key = step, origin
+        self.dirty = (0, self.height, 0, self.width)
+
+    def paint(self, draw):
+        # replace the shape layer with what draw(layer) paints on it; draw returns the
+        # box (y0, y1, x0, x1) it painted, or None
+        if self.shape_box is not None:
+            y0, y1, x0, x1 = self.shape_box
+            self.shape[y0:y1, x0:x1] = 255
+        self.dirty = union(self.dirty, self.shape_box)
+        self.shape_box = draw(self.shape)
+        self.dirty = union(self.dirty, self.shape_box)
+
+    def compose(self):
+        # bring the frame up to date; returns the box that changed, if any
+        box, self.dirty = self.dirty, None
+        if box is not None:
+            y0, y1, x0, x1 = box
+            self.frame[y0:y1, x0:x1] = self.grid[y0:y1, x0:x1]
+            ink = intersect(box, self.shape_box)
+            if ink is not None:
+                y0, y1, x0, x1 = ink
+                np.minimum(self.frame[y0:y1, x0:x1], self.shape[y0:y1, x0:x1], out=self.frame[y0:y1, x0:x1])
+        return box
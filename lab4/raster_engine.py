@@ -0,0 +1,297 @@
+import numpy as np
+
+# Array versions of the line algorithms of RasterApp. The *_lines functions take
+# arrays of segment ends (or scalars, broadcast) and return the points of all the
+# segments concatenated; points of segment j are [starts[j]:starts[j + 1]].
+# The points equal the scalar methods in lab4.py, which stay as the reference.
+#
+# With a `window` (xmin, xmax, ymin, ymax) only the points inside it are made, so
+# the cost follows what is visible rather than the size of the primitive. DDA and
+# Wu keep their running sums exact, so they still add up the steps before the
+# window, but only as floats in place.
+
+# segments accumulated at once by dda and wu, and the floats summed in one block
+CHUNK = 4096
+BLOCK = 1 << 20
+# circle octants in the order RasterApp.bres_circle adds them: (swap, sign x, sign y)
+OCTANTS = [(False, 1, 1), (False, -1, 1), (False, 1, -1), (False, -1, -1),
+           (True, 1, 1), (True, -1, 1), (True, 1, -1), (True, -1, -1)]
+
+
+def ends(x0, y0, x1, y1, dtype):
+    return [np.atleast_1d(np.asarray(v, dtype)) for v in np.broadcast_arrays(x0, y0, x1, y1)]
+
+
+def spread(counts):
+    # segment index and position within the segment of every output point
+    starts = np.zeros(len(counts) + 1, np.int64)
+    np.cumsum(counts, out=starts[1:])
+    seg = np.repeat(np.arange(len(counts)), counts)
+    return starts, seg, np.arange(starts[-1]) - starts[seg]
+
+
+def select(keep, seg, segments, *arrays):
+    starts = np.zeros(segments + 1, np.int64)
+    np.cumsum(np.bincount(seg[keep], minlength=segments), out=starts[1:])
+    return tuple(a[keep] for a in arrays) + (starts,)
+
+
+def inside(x, y, window):
+    xmin, xmax, ymin, ymax = window
+    return (x >= xmin) & (x <= xmax) & (y >= ymin) & (y <= ymax)
+
+
+def interval(start, sign, lo, hi):
+    # the steps p with lo <= start + sign * p <= hi
+    return np.where(sign > 0, lo - start, start - hi), np.where(sign > 0, hi - start, start - lo)
+
+
+def accumulate(first, inc, skip, counts, starts):
+    # first, first + inc, (first + inc) + inc, ... from step `skip` of every segment
+    # on: the same float additions in the same order as the scalar loops, so the
+    # rounding matches too. A window only cuts the far end of the sum, the steps
+    # before it are summed but not kept. Segments are sorted by length and summed a
+    # chunk of rows and a block of columns at a time, carrying the last sum over.
+    out = np.empty(starts[-1], np.float64)
+    end = skip + counts
+    order = np.flatnonzero(counts > 0)
+    order = order[np.argsort(end[order], kind="stable")]
+    for c in range(0, len(order), CHUNK):
+        idx = order[c:c + CHUNK]
+        width = int(end[idx].max())
+        cols = max(1, BLOCK // len(idx))
+        carry = None
+        for c0 in range(0, width, cols):
+            w = min(cols, width - c0)
+            block = np.empty((len(idx), w), np.float64)
+            block[:, 0] = first[idx] if carry is None else carry + inc[idx]
+            block[:, 1:] = inc[idx, None]
+            np.add.accumulate(block, axis=1, out=block)
+            carry = block[:, -1]
+            step = c0 + np.arange(w)
+            keep = (step >= skip[idx, None]) & (step < end[idx, None])
+            out[(starts[idx, None] + step - skip[idx, None])[keep]] = block[keep]
+    return out
+
+
+def clip_steps(counts, start, sign, lo, hi):
+    # the steps of every segment whose main axis lies in [lo, hi], one step to spare
+    # each side, as (skip, counts)
+    a, b = interval(start, sign, lo, hi)
+    first = np.clip(np.ceil(a) - 1, 0, counts).astype(np.int64)
+    last = np.clip(np.floor(b) + 1, -1, counts - 1).astype(np.int64)
+    return first, np.maximum(last - first + 1, 0)
+
+
+def step_lines(x0, y0, x1, y1, window=None):
+    x0, y0, x1, y1 = ends(x0, y0, x1, y1, np.int64)
+    vertical = x0 == x1
+    lo = np.where(vertical, np.minimum(y0, y1), np.minimum(x0, x1))
+    hi = np.where(vertical, np.maximum(y0, y1), np.maximum(x0, x1))
+    if window is not None:
+        # x (or y for a vertical line) runs over consecutive values: cut it to the window
+        xmin, xmax, ymin, ymax = window
+        lo = np.maximum(lo, np.where(vertical, ymin, xmin))
+        hi = np.minimum(hi, np.where(vertical, ymax, xmax))
+    k = (y1 - y0) / np.where(vertical, 1, x1 - x0)
+    b = y0 - k * x0
+    starts, seg, i = spread(np.maximum(hi - lo + 1, 0))
+    x = np.where(vertical[seg], x0[seg], lo[seg] + i)
+    # np.rint rounds halves to even, as Python's round does
+    y = np.where(vertical[seg], lo[seg] + i, np.rint(k[seg] * x + b[seg]).astype(np.int64))
+    if window is None:
+        return x, y, starts
+    return select(inside(x, y, window), seg, len(x0), x, y)
+
+
+def dda_lines(x0, y0, x1, y1, window=None):
+    x0, y0, x1, y1 = ends(x0, y0, x1, y1, np.float64)
+    dx, dy = x1 - x0, y1 - y0
+    steps = np.maximum(np.abs(dx), np.abs(dy))
+    safe = np.where(steps == 0, 1, steps)
+    incx, incy = dx / safe, dy / safe
+    counts = steps.astype(np.int64) + 1
+    skip = np.zeros(len(x0), np.int64)
+    if window is not None:
+        xmin, xmax, ymin, ymax = window
+        along_x = np.abs(dx) >= np.abs(dy)
+        # a step moves the main axis by exactly one; half a cell either way still rounds in
+        skip, counts = clip_steps(counts, np.where(along_x, x0, y0), np.where(along_x, incx, incy),
+                                  np.where(along_x, xmin, ymin) - 0.5, np.where(along_x, xmax, ymax) + 0.5)
+    starts, seg, _ = spread(counts)
+    x = np.rint(accumulate(x0, incx, skip, counts, starts)).astype(np.int64)
+    y = np.rint(accumulate(y0, incy, skip, counts, starts)).astype(np.int64)
+    if window is None:
+        return x, y, starts
+    return select(inside(x, y, window), seg, len(x0), x, y)
+
+
+def bres_lines(x0, y0, x1, y1, window=None):
+    x0, y0, x1, y1 = ends(x0, y0, x1, y1, np.int64)
+    dx, dy = np.abs(x1 - x0), np.abs(y1 - y0)
+    sx = np.where(x0 < x1, 1, -1)
+    sy = np.where(y0 < y1, 1, -1)
+    major = np.maximum(dx, dy)
+    minor = np.minimum(dx, dy)
+    along_x = dx >= dy
+    first = np.zeros(len(x0), np.int64)
+    last = major
+    if window is not None:
+        # the main axis moves one per step and the other by off(i) below, which never
+        # decreases, so each window edge bounds i in closed form
+        xmin, xmax, ymin, ymax = window
+        lo, hi = interval(np.where(along_x, x0, y0), np.where(along_x, sx, sy),
+                          np.where(along_x, xmin, ymin), np.where(along_x, xmax, ymax))
+        off_lo, off_hi = interval(np.where(along_x, y0, x0), np.where(along_x, sy, sx),
+                                  np.where(along_x, ymin, xmin), np.where(along_x, ymax, xmax))
+        den = 2 * np.maximum(minor, 1)
+        flat = minor == 0
+        lo = np.maximum(lo, np.where(flat, 0, (2 * off_lo - 1) * major // den + 1))
+        hi = np.minimum(hi, np.where(flat, np.where((off_lo <= 0) & (off_hi >= 0), major, -1),
+                                     (2 * off_hi + 1) * major // den))
+        first = np.maximum(lo, 0)
+        last = np.minimum(hi, major)
+    starts, seg, i = spread(np.maximum(last - first + 1, 0))
+    i += first[seg]
+    # closed form of the error loop: the minor axis advances at step i by
+    # ceil((2 * i * minor - major) / (2 * major)), halves rounding down
+    twice = 2 * np.maximum(major, 1)[seg]
+    off = -((twice // 2 - 2 * i * minor[seg]) // twice)
+    along_x = along_x[seg]
+    x = x0[seg] + sx[seg] * np.where(along_x, i, off)
+    y = y0[seg] + sy[seg] * np.where(along_x, off, i)
+    return x, y, starts
+
+
+def wu_lines(x0, y0, x1, y1, window=None):
+    # two points per column, as in RasterApp.wu; `alpha` is the coverage of each,
+    # 1 - distance from the line, and 0 where the point lies a whole pixel off
+    x0, y0, x1, y1 = ends(x0, y0, x1, y1, np.float64)
+    steep = np.abs(y1 - y0) > np.abs(x1 - x0)
+    x0, y0 = np.where(steep, y0, x0), np.where(steep, x0, y0)
+    x1, y1 = np.where(steep, y1, x1), np.where(steep, x1, y1)
+    back = x0 > x1
+    x0, x1 = np.where(back, x1, x0), np.where(back, x0, x1)
+    y0, y1 = np.where(back, y1, y0), np.where(back, y0, y1)
+    dx, dy = x1 - x0, y1 - y0
+    gradient = np.where(dx != 0, dy / np.where(dx != 0, dx, 1), 1)
+    column = np.trunc(x0).astype(np.int64)
+    counts = np.trunc(x1).astype(np.int64) - column + 1
+    skip = np.zeros(len(x0), np.int64)
+    if window is not None:
+        xmin, xmax, ymin, ymax = window
+        skip, counts = clip_steps(counts, column, 1, np.where(steep, ymin, xmin), np.where(steep, ymax, xmax))
+    starts, seg, i = spread(counts)
+    i += skip[seg]
+
+    y = accumulate(y0, gradient, skip, counts, starts)
+    iy = np.trunc(y).astype(np.int64)
+    major = np.repeat(column[seg] + i, 2)
+    minor = np.stack([iy, iy + 1], axis=1).ravel()
+    alpha = np.stack([1 - np.abs(y - iy), np.maximum(0, 1 - np.abs(iy + 1 - y))], axis=1).ravel()
+    steep = np.repeat(steep[seg], 2)
+    x = np.where(steep, minor, major)
+    y = np.where(steep, major, minor)
+    if window is None:
+        return x, y, alpha, 2 * starts
+    return select(inside(x, y, window), np.repeat(seg, 2), len(x0), x, y, alpha)
+
+
+def circle_root(x, r):
+    # the largest y with D(x - 1, y) <= 0, where D(x, y) = 2x² + 8x + 2y² - 6y + 4r + 3 - 2r²
+    # is the decision value of RasterApp.bres_circle at (x, y)
+    t = 2 * r * r - 2 * (x - 1) ** 2 - 8 * (x - 1) - 4 * r - 3
+    y = ((3 + np.sqrt(np.maximum(9 + 2 * t, 0))) // 2).astype(np.int64)
+    # the float square root can be one off either way
+    for _ in range(2):
+        y += 2 * (y + 1) ** 2 - 6 * (y + 1) <= t
+        y -= 2 * y * y - 6 * y > t
+    return np.where(x <= 0, r, y)
+
+
+def circle_y(x, r):
+    # y of the circle loop at column x: the loop moves y down by at most one a column
+    return np.where(x == 0, r, np.maximum(circle_root(x, r), circle_root(x - 1, r) - 1))
+
+
+def first_true(pred, lo, hi):
+    # smallest p in [lo, hi) with pred(p), or hi; pred must be monotone
+    lo, hi = lo.copy(), hi.copy()
+    while np.any(lo < hi):
+        mid = (lo + hi) // 2
+        hit = pred(mid) | (lo >= hi)
+        hi = np.where(hit, mid, hi)
+        lo = np.where(hit, lo, mid + 1)
+    return lo
+
+
+def bres_circles(xc, yc, r, window=None):
+    # the loop of RasterApp.bres_circle runs x = 0, 1, ... while y(x) >= x, with y(x)
+    # in closed form above; without a window the points come in its order, eight a
+    # column, and with one each octant is cut to the columns that reach into it
+    xc, yc, r = [np.atleast_1d(np.asarray(v, np.int64)) for v in np.broadcast_arrays(xc, yc, r)]
+    zero = np.zeros(len(r), np.int64)
+    columns = first_true(lambda x: circle_y(x, r) < x, zero, np.maximum(r + 2, 0))
+    columns = np.where(r == 0, 1, np.where(r < 0, 0, columns))
+    if window is None:
+        starts, seg, x = spread(columns)
+        y = circle_y(x, r[seg])
+        px = np.stack([x, -x, x, -x, y, -y, y, -y], axis=1) + xc[seg, None]
+        py = np.stack([y, y, -y, -y, x, x, -x, -x], axis=1) + yc[seg, None]
+        return px.ravel(), py.ravel(), 8 * starts
+
+    xmin, xmax, ymin, ymax = window
+    bounds = []
+    for swap, sx, sy in OCTANTS:
+        # x is the column, `y` the coordinate following y(x)
+        x_lo, x_hi = interval(yc if swap else xc, sy if swap else sx, *((ymin, ymax) if swap else (xmin, xmax)))
+        y_lo, y_hi = interval(xc if swap else yc, sx if swap else sy, *((xmin, xmax) if swap else (ymin, ymax)))
+        bounds.append((x_lo, x_hi, y_lo, y_hi))
+    x_lo, x_hi, y_lo, y_hi = [np.stack(b, axis=1).ravel() for b in zip(*bounds)]
+    # y(x) never increases, so y_lo <= y(x) <= y_hi from the first column with
+    # y(x) < y_hi + 1 up to the one before the first with y(x) < y_lo; all the
+    # octants of all the circles are searched at once
+    radius = np.tile(np.repeat(r, 8), 2)
+    limit = np.concatenate([y_hi + 1, y_lo])
+    found = first_true(lambda x: circle_y(x, radius) < limit, np.zeros(len(limit), np.int64),
+                       np.tile(np.repeat(columns, 8), 2))
+    lo, hi = np.split(found, 2)
+    first = np.maximum(np.maximum(lo, x_lo), 0)
+    last = np.minimum(np.minimum(hi - 1, x_hi), np.repeat(columns, 8) - 1)
+    starts, part, x = spread(np.maximum(last - first + 1, 0))
+    x += first[part]
+    seg, octant = part // 8, part % 8
+    y = circle_y(x, r[seg])
+    swap = octant >= 4
+    sx = np.array([o[1] for o in OCTANTS])[octant]
+    sy = np.array([o[2] for o in OCTANTS])[octant]
+    px = xc[seg] + sx * np.where(swap, y, x)
+    py = yc[seg] + sy * np.where(swap, x, y)
+    return px, py, starts[::8]
+
+
+def step(x0, y0, x1, y1, window=None):
+    return step_lines(x0, y0, x1, y1, window)[:2]
+
+
+def dda(x0, y0, x1, y1, window=None):
+    return dda_lines(x0, y0, x1, y1, window)[:2]
+
+
+def bres_line(x0, y0, x1, y1, window=None):
+    return bres_lines(x0, y0, x1, y1, window)[:2]
+
+
+def wu(x0, y0, x1, y1, window=None):
+    return wu_lines(x0, y0, x1, y1, window)[:3]
+
+
+def bres_circle(xc, yc, r, window=None):
+    return bres_circles(xc, yc, r, window)[:2]
+
+
+def points(x, y):
+    return list(zip(x.tolist(), y.tolist()))
+
+
+ALGORITHMS = {'step': step, 'dda': dda, 'bres_line': bres_line, 'wu': wu, 'bres_circle': bres_circle}
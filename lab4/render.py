@@ -0,0 +1,115 @@
+import numpy as np
+
+# Cells for a whole array of logical points at once, in place of one cv2.rectangle
+# per point. A cell is the square of side 2 * half + 1 around the screen point
+# (origin + x * step, origin - y * step), as RasterApp.draw_pixel draws it. Cells
+# darken the image (np.minimum): black cells overwrite, Wu coverage given as
+# `alpha` shows as grey levels, and where cells overlap the darkest one stays.
+
+
+def shades(count, color, alpha):
+    color = np.asarray(color, np.float64)
+    if alpha is None:
+        return np.broadcast_to(color.astype(np.uint8), (count, len(color)))
+    return np.rint(255 - np.clip(alpha, 0, 1)[:, None] * (255 - color)).astype(np.uint8)
+
+
+def fill_cells(img, cx, cy, half, shade, blend):
+    # the pixels of every cell as index arrays broadcast from its centre:
+    # the work is proportional to the painted area
+    h, w = img.shape[:2]
+    d = np.arange(-half, half + 1)
+    xs = np.broadcast_to((cx[:, None] + d)[:, None, :], (len(cx), len(d), len(d)))
+    ys = np.broadcast_to((cy[:, None] + d)[:, :, None], xs.shape)
+    keep = (xs >= 0) & (xs < w) & (ys >= 0) & (ys < h)
+    pixels = ys[keep], xs[keep]
+    shade = np.broadcast_to(shade[:, None, None], xs.shape + shade.shape[1:])[keep]
+    if blend:
+        np.minimum.at(img, pixels, shade)
+    else:
+        img[pixels] = np.minimum(img[pixels], shade)
+
+
+def axis_map(size, origin, step, half, sign):
+    # logical index of the cell under each pixel of an axis; with an even step
+    # neighbouring cells share their edge pixel, which `seam` marks
+    u = sign * (np.arange(size) - origin) + half
+    index = u // step
+    seam = (u == index * step) & (2 * half >= step)
+    return index, seam
+
+
+def upsample_cells(img, x, y, origin, step, half, shade, blend):
+    # paint the visible part of the logical grid, one value per cell, and scale it
+    # to the screen with nearest-neighbour index maps: the work is proportional to
+    # the image size, whatever the number of points
+    h, w = img.shape[:2]
+    ix, seam_x = axis_map(w, origin[0], step, half, 1)
+    iy, seam_y = axis_map(h, origin[1], step, half, -1)
+    x_lo, y_lo = ix[0] - 1, iy[-1] - 1
+    grid = np.full((iy[0] - y_lo + 1, ix[-1] - x_lo + 1) + img.shape[2:], 255, np.uint8)
+    inside = (x >= x_lo) & (x <= ix[-1]) & (y >= y_lo) & (y <= iy[0])
+    cells = (y[inside] - y_lo, x[inside] - x_lo)
+    if blend:
+        np.minimum.at(grid, cells, shade[inside])
+    else:
+        grid[cells] = shade[inside]
+
+    cols = grid[:, ix - x_lo]
+    np.minimum(cols, grid[:, ix - 1 - x_lo], out=cols, where=seam_x[:, None] if grid.ndim == 3 else seam_x)
+    rows = cols[iy - y_lo]
+    np.minimum(rows, cols[iy - 1 - y_lo], out=rows, where=seam_y.reshape((-1,) + (1,) * (rows.ndim - 1)))
+    np.minimum(img, rows, out=img)
+
+
+def window(origin, step, half, width, height):
+    # the logical cells whose squares reach into the image, as (xmin, xmax, ymin, ymax);
+    # with a zero step every point is drawn at the origin and nothing can be left out
+    if step <= 0:
+        return None
+    ox, oy = origin
+    return (-((half + ox) // step), (width - 1 + half - ox) // step,
+            -((height - 1 + half - oy) // step), (oy + half) // step)
+
+
+def cells_box(x, y, origin, step, half, width, height):
+    # the pixels the cells of the points cover in the image, as (y0, y1, x0, x1), or None
+    x = np.asarray(x, np.int64)
+    y = np.asarray(y, np.int64)
+    if not x.size:
+        return None
+    x0 = max(origin[0] + int(x.min()) * step - half, 0)
+    x1 = min(origin[0] + int(x.max()) * step + half + 1, width)
+    y0 = max(origin[1] - int(y.max()) * step - half, 0)
+    y1 = min(origin[1] - int(y.min()) * step + half + 1, height)
+    return (y0, y1, x0, x1) if x0 < x1 and y0 < y1 else None
+
+
+def draw_cells(img, x, y, origin, step, half, alpha=None, color=(0, 0, 0), mode="auto"):
+    # mode: "cells" fills each cell, "upsample" scales a logical grid, "auto" picks
+    # the one that touches fewer pixels; returns the box painted, as cells_box
+    x = np.asarray(x, np.int64).ravel()
+    y = np.asarray(y, np.int64).ravel()
+    h, w = img.shape[:2]
+    cx = origin[0] + x * step
+    cy = origin[1] - y * step
+    visible = (cx + half >= 0) & (cx - half < w) & (cy + half >= 0) & (cy - half < h)
+    if alpha is not None:
+        alpha = np.asarray(alpha, np.float64).ravel()[visible]
+    x, y, cx, cy = x[visible], y[visible], cx[visible], cy[visible]
+    if not len(x):
+        return None
+    shade = shades(len(x), color if img.ndim == 3 else color[:1], alpha)
+    if img.ndim == 2:
+        shade = shade[:, 0]
+    # repeated points only need the ufunc.at path when their values differ
+    blend = alpha is not None
+    if mode == "auto":
+        mode = "upsample" if step >= 2 and len(x) * (2 * half + 1) ** 2 > h * w else "cells"
+    if mode == "upsample":
+        if step < 2:
+            raise ValueError("для увеличения сетки шаг должен быть не меньше 2")
+        upsample_cells(img, x, y, origin, step, half, shade, blend)
+    else:
+        fill_cells(img, cx, cy, half, shade, blend)
+    return cells_box(x, y, origin, step, half, w, h)
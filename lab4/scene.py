@@ -0,0 +1,256 @@
+import argparse
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+import curves
+import raster_engine
+import render
+
+LINES = {
+    'step': (raster_engine.step_lines, np.int64),
+    'dda': (raster_engine.dda_lines, np.float64),
+    'bres_line': (raster_engine.bres_lines, np.int64),
+    'wu': (raster_engine.wu_lines, np.float64),
+}
+ALGORITHMS = tuple(LINES) + ("bres_circle", "casteljau")
+
+
+class Scene:
+    # primitives as arrays, one per algorithm: line ends (n, 4), circles (n, 3) as
+    # xc, yc, r, and Bézier control polygons (n, degree + 1, 2) kept per degree
+    def __init__(self):
+        self.lines = {name: np.empty((0, 4), dtype) for name, (_, dtype) in LINES.items()}
+        self.circles = np.empty((0, 3), np.int64)
+        self.curves = {}
+
+    def __len__(self):
+        return (sum(len(v) for v in self.lines.values()) + len(self.circles)
+                + sum(len(v) for v in self.curves.values()))
+
+    def add_lines(self, algorithm, ends):
+        ends = np.asarray(ends, LINES[algorithm][1]).reshape(-1, 4)
+        self.lines[algorithm] = np.concatenate([self.lines[algorithm], ends])
+
+    def add_circles(self, circles):
+        self.circles = np.concatenate([self.circles, np.asarray(circles, np.int64).reshape(-1, 3)])
+
+    def add_curves(self, ctrl):
+        ctrl = np.asarray(ctrl, np.float64)
+        degree = ctrl.shape[1] - 1
+        old = self.curves.get(degree)
+        self.curves[degree] = ctrl if old is None else np.concatenate([old, ctrl])
+
+    def counts(self):
+        counts = {name: len(ends) for name, ends in self.lines.items()}
+        counts['bres_circle'] = len(self.circles)
+        counts['casteljau'] = sum(len(v) for v in self.curves.values())
+        return {name: n for name, n in counts.items() if n}
+
+    def within(self, window):
+        # the primitives whose bounding boxes reach into the window (a Bézier curve
+        # stays inside the box of its control polygon)
+        xmin, xmax, ymin, ymax = window
+        part = Scene()
+
+        def near(lo_x, hi_x, lo_y, hi_y):
+            return (hi_x >= xmin - 1) & (lo_x <= xmax + 1) & (hi_y >= ymin - 1) & (lo_y <= ymax + 1)
+
+        for name, e in self.lines.items():
+            xs, ys = e[:, 0::2], e[:, 1::2]
+            part.lines[name] = e[near(xs.min(axis=1), xs.max(axis=1), ys.min(axis=1), ys.max(axis=1))]
+        xc, yc, r = self.circles.T
+        part.circles = self.circles[near(xc - r, xc + r, yc - r, yc + r)]
+        for degree, ctrl in self.curves.items():
+            lo, hi = ctrl.min(axis=1), ctrl.max(axis=1)
+            part.curves[degree] = ctrl[near(lo[:, 0], hi[:, 0], lo[:, 1], hi[:, 1])]
+        return part
+
+    def batches(self):
+        # (algorithm, function of the window, primitives) for every non-empty group
+        for name, (func, _) in LINES.items():
+            ends = self.lines[name]
+            if len(ends):
+                yield name, lambda window, f=func, e=ends: f(*e.T, window=window), len(ends)
+        if len(self.circles):
+            yield "bres_circle", lambda window: raster_engine.bres_circles(*self.circles.T, window=window), len(self.circles)
+        for degree in sorted(self.curves):
+            ctrl = self.curves[degree]
+            yield "casteljau", lambda window, c=ctrl: curves.bezier_curves(c, window=window), len(ctrl)
+
+
+def run_batches(scene, window):
+    groups, seconds = {}, {}
+    for name, func, _ in scene.batches():
+        start = time.perf_counter()
+        # the per-primitive starts are not needed to draw
+        pts = func(window)[:-1]
+        seconds[name] = seconds.get(name, 0.0) + time.perf_counter() - start
+        groups.setdefault(name, []).append(pts)
+    return groups, seconds
+
+
+def bands(window, count):
+    # the window cut across its longer side into `count` strips of whole cells
+    xmin, xmax, ymin, ymax = window
+    along_x = xmax - xmin >= ymax - ymin
+    lo, hi = (xmin, xmax) if along_x else (ymin, ymax)
+    edges = np.linspace(lo, hi + 1, min(count, hi - lo + 1) + 1).astype(np.int64)
+    for a, b in zip(edges[:-1], edges[1:]):
+        yield (a, b - 1, ymin, ymax) if along_x else (xmin, xmax, a, b - 1)
+
+
+def rasterize(scene, window=None, workers=1):
+    # points per algorithm as {algorithm: [(x, y[, alpha]), ...]} and statistics per
+    # algorithm. With a window and several workers, the window is cut into bands that
+    # are rasterized on a thread pool, each band only with the primitives that can
+    # reach it; each point falls in exactly one band.
+    start = time.perf_counter()
+    if window is None or workers <= 1:
+        groups, seconds = run_batches(scene, window)
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            parts = list(pool.map(lambda w: run_batches(scene.within(w), w), bands(window, 2 * workers)))
+        groups, seconds = {}, {}
+        for part_groups, part_seconds in parts:
+            for name, batches in part_groups.items():
+                groups.setdefault(name, []).extend(batches)
+                seconds[name] = seconds.get(name, 0.0) + part_seconds[name]
+    elapsed = time.perf_counter() - start
+
+    counts = scene.counts()
+    stats = {name: {'primitives': counts[name], 'points': sum(len(p[0]) for p in groups[name]),
+                    'seconds': seconds[name]} for name in groups}
+    return groups, stats, elapsed
+
+
+def load_scene(path):
+    # one primitive a line: an algorithm and its numbers, blank lines and # comments
+    # skipped, e.g.
+    #   bres_line -5 -5 10 8
+    #   bres_circle 0 0 10
+    #   casteljau -5 -5 0 10 10 8    (control points, two or more)
+    lines = {name: [] for name in LINES}
+    circles = []
+    ctrl = {}
+    with open(path, encoding="utf-8") as f:
+        for number, text in enumerate(f, 1):
+            fields = text.split("#", 1)[0].split()
+            if not fields:
+                continue
+            name, values = fields[0], fields[1:]
+            try:
+                if name in LINES:
+                    if len(values) != 4:
+                        raise ValueError("ожидается 4 числа")
+                    parse = float if LINES[name][1] is np.float64 else int
+                    lines[name].append([parse(v) for v in values])
+                elif name == "bres_circle":
+                    if len(values) != 3:
+                        raise ValueError("ожидается 3 числа")
+                    circles.append([int(v) for v in values])
+                elif name == "casteljau":
+                    if len(values) < 4 or len(values) % 2:
+                        raise ValueError("ожидаются пары координат, не меньше двух точек")
+                    pts = [float(v) for v in values]
+                    ctrl.setdefault(len(pts) // 2, []).append(pts)
+                else:
+                    raise ValueError(f"неизвестный алгоритм {name!r}")
+            except ValueError as e:
+                raise ValueError(f"{path}, строка {number}: {e}") from None
+
+    scene = Scene()
+    for name, ends in lines.items():
+        if ends:
+            scene.add_lines(name, ends)
+    if circles:
+        scene.add_circles(circles)
+    for points, polygons in ctrl.items():
+        scene.add_curves(np.array(polygons).reshape(-1, points, 2))
+    return scene
+
+
+def save_scene(scene, path):
+    with open(path, "w", encoding="utf-8") as f:
+        for name, ends in scene.lines.items():
+            for row in ends.tolist():
+                f.write(" ".join([name] + [str(v) for v in row]) + "\n")
+        for row in scene.circles.tolist():
+            f.write(" ".join(["bres_circle"] + [str(v) for v in row]) + "\n")
+        for ctrl in scene.curves.values():
+            for row in ctrl.reshape(len(ctrl), -1).tolist():
+                f.write(" ".join(["casteljau"] + [str(v) for v in row]) + "\n")
+
+
+def random_scene(count=1000, extent=100, seed=None, degree=3):
+    # `count` primitives of every algorithm with points in [-extent, extent]
+    rng = np.random.default_rng(seed)
+    scene = Scene()
+    for name, (_, dtype) in LINES.items():
+        ends = rng.uniform(-extent, extent, (count, 4))
+        scene.add_lines(name, np.rint(ends) if dtype is np.int64 else ends)
+    centres = rng.integers(-extent, extent + 1, (count, 2))
+    scene.add_circles(np.column_stack([centres, rng.integers(1, max(extent // 2, 1) + 1, count)]))
+    scene.add_curves(np.rint(rng.uniform(-extent, extent, (count, degree + 1, 2))))
+    return scene
+
+
+def report(stats, elapsed):
+    rows = [f"{name}: {s['seconds'] * 1000:.1f} мс, {s['primitives']} прим., {s['points']} точек"
+            for name, s in stats.items()]
+    return "\n".join(rows + [f"Всего: {elapsed * 1000:.1f} мс"])
+
+
+def parse_size(text):
+    width, _, height = text.lower().partition("x")
+    return int(width), int(height)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Rasterize a lab4 scene and report the time per algorithm.")
+    parser.add_argument("scene", nargs="?", help="scene file; without it a random scene is made")
+    parser.add_argument("-n", "--count", type=int, default=1000, help="random scene: primitives per algorithm")
+    parser.add_argument("--extent", type=int, default=100, help="random scene: coordinate range")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--save", help="write the scene to this file")
+    parser.add_argument("--size", type=parse_size, default=(900, 700), help="view in pixels, WxH")
+    parser.add_argument("--cell", type=int, default=20, help="cell side in pixels")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="threads over bands of the window")
+    parser.add_argument("-o", "--output", help="write the drawn cells to this image")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        scene = load_scene(args.scene) if args.scene else random_scene(args.count, args.extent, args.seed)
+    except (OSError, ValueError) as e:
+        print(f"Ошибка: {e}", file=sys.stderr)
+        return 1
+    if args.save:
+        save_scene(scene, args.save)
+
+    width, height = args.size
+    origin = (width // 2, height // 2)
+    half = max(1, args.cell // 2)
+    window = render.window(origin, args.cell, half, width, height)
+    groups, stats, elapsed = rasterize(scene, window, args.workers)
+    print(f"{len(scene)} примитивов, окно {window}", file=sys.stderr)
+    print(report(stats, elapsed), file=sys.stderr)
+
+    if args.output:
+        img = np.full((height, width, 3), 255, np.uint8)
+        for batches in groups.values():
+            for pts in batches:
+                render.draw_cells(img, *pts[:2], origin, args.cell, half, *pts[2:])
+        if not cv2.imwrite(args.output, img):
+            print(f"Не удалось записать {args.output}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
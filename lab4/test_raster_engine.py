@@ -0,0 +1,47 @@
+import numpy as np
+
+import raster_engine
+from lab4 import RasterApp
+
+
+def random_case(rng, algorithm):
+    if algorithm == "bres_circle":
+        return int(rng.integers(-60, 60)), int(rng.integers(-60, 60)), int(rng.integers(0, 80))
+    if algorithm in ("dda", "wu") and rng.random() < 0.5:
+        return tuple(float(v) for v in rng.uniform(-80, 80, 4).round(1))
+    # integer ends put DDA and Wu on exact .5 ties, where only the running sum rounds right
+    return tuple(int(v) for v in rng.integers(-80, 80, 4))
+
+
+def random_window(rng):
+    x, y = (int(v) for v in rng.integers(-60, 50, 2))
+    return x, x + int(rng.integers(0, 40)), y, y + int(rng.integers(0, 40))
+
+
+def test_window_equals_filtered_reference():
+    rng = np.random.default_rng(1)
+    for algorithm in raster_engine.ALGORITHMS:
+        for _ in range(600):
+            args = random_case(rng, algorithm)
+            window = random_window(rng)
+            xmin, xmax, ymin, ymax = window
+            ref = getattr(RasterApp, algorithm)(None, *args)
+            keep = [i for i, (x, y) in enumerate(ref) if xmin <= x <= xmax and ymin <= y <= ymax]
+            out = raster_engine.ALGORITHMS[algorithm](*args, window=window)
+            got = raster_engine.points(out[0], out[1])
+            expected = [ref[i] for i in keep]
+            if algorithm == "bres_circle":
+                # a windowed circle comes octant by octant
+                got, expected = sorted(got), sorted(expected)
+            assert got == expected, (algorithm, args, window)
+            if algorithm == "wu":
+                assert np.array_equal(out[2], raster_engine.wu(*args)[2][keep]), (args, window)
+
+
+def test_whole_equals_reference():
+    rng = np.random.default_rng(2)
+    for algorithm in raster_engine.ALGORITHMS:
+        for _ in range(300):
+            args = random_case(rng, algorithm)
+            out = raster_engine.ALGORITHMS[algorithm](*args)
+            assert raster_engine.points(out[0], out[1]) == getattr(RasterApp, algorithm)(None, *args), (algorithm, args)
@@ -0,0 +1,47 @@
+import numpy as np
+
+import render
+import scene
+
+
+def integer_scene(count, extent, seed):
+    # integer ends put DDA and Wu on exact .5 ties
+    rng = np.random.default_rng(seed)
+    sc = scene.Scene()
+    for name in scene.LINES:
+        sc.add_lines(name, rng.integers(-extent, extent + 1, (count, 4)))
+    sc.add_circles(np.column_stack([rng.integers(-extent, extent + 1, (count, 2)),
+                                    rng.integers(0, extent // 2 + 1, count)]))
+    sc.add_curves(rng.integers(-extent, extent + 1, (count, 4, 2)))
+    return sc
+
+
+def frame(sc, cell, workers, width=900, height=700):
+    origin = (width // 2, height // 2)
+    half = max(1, cell // 2)
+    groups, _, _ = scene.rasterize(sc, render.window(origin, cell, half, width, height), workers)
+    img = np.full((height, width, 3), 255, np.uint8)
+    for batches in groups.values():
+        for pts in batches:
+            render.draw_cells(img, *pts[:2], origin, cell, half, *pts[2:])
+    return img
+
+
+def test_workers_draw_the_same_frame():
+    for seed, sc in enumerate([integer_scene(300, 200, 1), scene.random_scene(300, 200, seed=2)]):
+        for cell in (20, 7, 3, 2):
+            single = frame(sc, cell, 1)
+            for workers in (2, 3, 5):
+                assert np.array_equal(frame(sc, cell, workers), single), (seed, cell, workers)
+
+
+def test_save_and_load(tmp_path):
+    sc = scene.random_scene(50, 40, seed=3)
+    path = tmp_path / "scene.txt"
+    scene.save_scene(sc, path)
+    loaded = scene.load_scene(path)
+    assert loaded.counts() == sc.counts()
+    for name in scene.LINES:
+        assert np.array_equal(loaded.lines[name], sc.lines[name])
+    assert np.array_equal(loaded.circles, sc.circles)
+    assert all(np.array_equal(loaded.curves[d], sc.curves[d]) for d in sc.curves)